@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: records per second of RedactingFormatter by share of
+records holding PII, against the former regex-per-record formatter,
+and of StructuredRedactingFormatter given the same fields as a mapping
+Usage: ./bench_filtered_logger.py [number of records, default 100000]
+"""
+import logging
+import re
+import sys
+import time
+
+from filtered_logger import (
+    PII_FIELDS,
+    RedactingFormatter,
+    StructuredRedactingFormatter
+)
+
+PII_MESSAGE = (
+    "name=Marlene Wood; email=hwestiii@att.net; phone=(473) 401-4253; "
+    "ssn=261-72-6780; password=K5?BMNv; ip=60ed:c396:2ff:244:bbd0; "
+    "last_login=2019-11-14 06:14:24; user_agent=Mozilla/5.0;"
+)
+PLAIN_MESSAGE = "GET /api/v1/status 200 in 3ms from 10.0.0.7; cache=hit;"
+PII_FIELDS_MAP = dict(
+    pair.split('=', 1) for pair in PII_MESSAGE.rstrip(';').split('; ')
+)
+PLAIN_FIELDS_MAP = {'request': 'GET /api/v1/status 200 in 3ms',
+                    'ip': '10.0.0.7', 'cache': 'hit'}
+
+
+class LegacyFormatter(RedactingFormatter):
+    """
+    RedactingFormatter building and running its regex on every record
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        """Format the log message
+        """
+        msg = logging.Formatter.format(self, record)
+        regex = r'(?P<field>{})=[^{}]*'.format(
+            '|'.join(self.fields),
+            self.SEPARATOR
+        )
+        return re.sub(regex, r'\g<field>={}'.format(self.REDACTION), msg)
+
+
+def make_records(count: int, density: float, structured: bool) -> list:
+    """
+    Build count records, a density share of them holding PII, the
+    fields as text or as a mapping logged as message if structured
+    """
+    every = round(1 / density) if density else 0
+    pii, plain = PII_MESSAGE, PLAIN_MESSAGE
+    if structured:
+        pii, plain = PII_FIELDS_MAP, PLAIN_FIELDS_MAP
+    return [
+        logging.LogRecord(
+            'user_data', logging.INFO, __file__, 0,
+            pii if every and i % every == 0 else plain,
+            None, None
+        )
+        for i in range(count)
+    ]
+
+
+def measure_redaction(count: int) -> None:
+    """
+    Print the cost of redacting one PII record, without the rest of
+    the formatting: regex over the text against lookup by key
+    """
+    regex = r'(?P<field>{})=[^{}]*'
+    formatter = StructuredRedactingFormatter(PII_FIELDS)
+    start = time.perf_counter()
+    for _ in range(count):
+        re.sub(regex.format('|'.join(PII_FIELDS), ';'), r'\g<field>=***',
+               PII_MESSAGE)
+    before = (time.perf_counter() - start) / count
+    start = time.perf_counter()
+    for _ in range(count):
+        formatter.render(PII_FIELDS_MAP)
+    after = (time.perf_counter() - start) / count
+    print("redaction only: filter_datum regex {:.2f}us, "
+          "structured {:.2f}us (x{:.1f})".format(
+              before * 1e6, after * 1e6, before / after))
+
+
+def measure(formatter: logging.Formatter, records: list) -> float:
+    """
+    Return the records formatted per second
+    """
+    start = time.perf_counter()
+    for record in records:
+        formatter.format(record)
+
+    return len(records) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for density in (0, 0.1, 1):
+        records = make_records(count, density, False)
+        before = measure(LegacyFormatter(PII_FIELDS), records)
+        after = measure(RedactingFormatter(PII_FIELDS), records)
+        print("{:>4.0%} PII: before {:>8.0f} records/s, "
+              "after {:>8.0f} records/s (x{:.1f})".format(
+                  density, before, after, after / before))
+        records = make_records(count, density, True)
+        for name, json_lines in (('text', False), ('json', True)):
+            structured = measure(
+                StructuredRedactingFormatter(PII_FIELDS, json_lines),
+                records
+            )
+            print("{:>4.0%} PII: structured {} {:>8.0f} records/s "
+                  "(x{:.1f})".format(density, name, structured,
+                                     structured / before))
+    measure_redaction(count)
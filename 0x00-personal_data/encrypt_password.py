@@ -3,6 +3,9 @@
 Implement a function that perform password encryption
 """
 import bcrypt
+from os import getenv
+
+BCRYPT_ROUNDS = int(getenv('BCRYPT_ROUNDS', 12))
 
 
 def hash_password(password: str) -> bytes:
@@ -11,7 +14,7 @@ def hash_password(password: str) -> bytes:
     """
     password = password.encode('utf-8')
 
-    return bcrypt.hashpw(password, bcrypt.gensalt())
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
 
 
 def is_valid(hashed_password: bytes, password: str) -> bool:
@@ -2,13 +2,28 @@
 """
 Provide functions to process log messages
 """
+import atexit
+import functools
+import json
+import queue
 import re
+import sys
+import time
 import typing as t
 import logging
-import mysql.connector
+import logging.handlers
+from collections.abc import Mapping
+from json.encoder import encode_basestring_ascii
 from os import getenv
 
+if t.TYPE_CHECKING:
+    import mysql.connector
+
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
+EXPORT_BATCH_SIZE = int(getenv("EXPORT_BATCH_SIZE", 10000))
+LOG_QUEUE_SIZE = int(getenv("LOG_QUEUE_SIZE", 10000))
+LOG_QUEUE_POLICY = getenv("LOG_QUEUE_POLICY", "drop")
+_NOT_MAPPINGS = (str, tuple, type(None))
 
 
 class RedactingFormatter(logging.Formatter):
@@ -24,15 +39,65 @@ class RedactingFormatter(logging.Formatter):
         """
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.engine = get_redaction_engine(
+            tuple(fields),
+            self.REDACTION,
+            self.SEPARATOR
+        )
 
     def format(self, record: logging.LogRecord) -> str:
         """Format the log message
         """
         msg = super(RedactingFormatter, self).format(record)
-        txt = filter_datum(self.fields, self.REDACTION, msg, self.SEPARATOR)
+        txt = self.engine.redact(msg)
         return txt
 
 
+class RedactionEngine:
+    """
+    Redaction of field=value pairs, compiled once
+    """
+    def __init__(
+        self,
+        fields: t.Sequence[str],
+        redaction: str,
+        separator: str
+    ):
+        """
+        Initialization method
+        """
+        self.fields = tuple(fields)
+        self.tokens = tuple(
+            '{}='.format(field) for field in self.fields
+        ) or ('=',)
+        self.pattern = re.compile(
+            r'(?P<field>{})=[^{}]*'.format('|'.join(self.fields), separator)
+        )
+        self.replacement = r'\g<field>={}'.format(redaction)
+
+    def redact(self, message: str) -> str:
+        """
+        Obfuscate message, returned as is without a field= token
+        """
+        for token in self.tokens:
+            if token in message:
+                return self.pattern.sub(self.replacement, message)
+
+        return message
+
+
+@functools.lru_cache(maxsize=None)
+def get_redaction_engine(
+    fields: t.Tuple[str, ...],
+    redaction: str,
+    separator: str
+) -> RedactionEngine:
+    """
+    Get the engine of given fields, redaction and separator
+    """
+    return RedactionEngine(fields, redaction, separator)
+
+
 def filter_datum(
     fields: t.List[str],
     redaction: str,
@@ -42,15 +107,197 @@ def filter_datum(
     """
     Obfuscate log message
     """
-    regex = r'(?P<field>{})=[^{}]*'.format('|'.join(fields), separator)
-    return re.sub(regex, r'\g<field>={}'.format(redaction), message)
+    engine = get_redaction_engine(tuple(fields), redaction, separator)
+    return engine.redact(message)
+
+
+class StructuredRedactingFormatter(logging.Formatter):
+    """ Redacting Formatter of records carrying their fields as a
+    mapping, rendered as "key=value;" pairs in the RedactingFormatter
+    format, or as JSON lines if json_lines is set
+    """
+    REDACTION = RedactingFormatter.REDACTION
+    FORMAT = RedactingFormatter.FORMAT
+    SEPARATOR = RedactingFormatter.SEPARATOR
+
+    def __init__(self, fields: t.Sequence[str], json_lines: bool = False):
+        """
+        Initialization method
+        """
+        super(StructuredRedactingFormatter, self).__init__(self.FORMAT)
+        self.fields = frozenset(fields)
+        self.json_lines = json_lines
+        self.engine = get_redaction_engine(
+            tuple(fields),
+            self.REDACTION,
+            self.SEPARATOR
+        )
+        self._encoder = json.JSONEncoder(default=str)
+        self._json_redaction = encode_basestring_ascii(self.REDACTION)
+
+    @staticmethod
+    def fields_of(record: logging.LogRecord) -> t.Optional[Mapping]:
+        """
+        Get the fields of a record: extra={'fields': ...}, a mapping
+        passed as argument, or a mapping logged as message
+        """
+        for fields in (
+            record.__dict__.get('fields'),
+            record.args,
+            record.msg
+        ):
+            kind = type(fields)
+            if kind is dict or (
+                kind not in _NOT_MAPPINGS and isinstance(fields, Mapping)
+            ):
+                return fields
+
+        return None
+
+    def redact(self, fields: Mapping) -> t.Dict[str, t.Any]:
+        """
+        Copy fields with the values of the PII keys redacted
+        """
+        return {
+            key: self.REDACTION if key in self.fields else value
+            for key, value in fields.items()
+        }
+
+    def render(self, fields: Mapping) -> str:
+        """
+        Render fields as "key=value;" pairs, the values of the PII
+        keys redacted, in a single pass
+        """
+        return '; '.join([
+            '%s=%s' % (key, self.REDACTION if key in self.fields else value)
+            for key, value in fields.items()
+        ]) + self.SEPARATOR
+
+    def render_json(self, fields: Mapping) -> str:
+        """
+        Render fields as a JSON object, the values of the PII keys
+        redacted, in a single pass: the same text as json.dumps of
+        redact(fields)
+        """
+        quote = encode_basestring_ascii
+        try:
+            return '{' + ', '.join([
+                '%s: %s' % (
+                    quote(key),
+                    self._json_redaction if key in self.fields
+                    else quote(value) if type(value) is str
+                    else self._encoder.encode(value)
+                )
+                for key, value in fields.items()
+            ]) + '}'
+        except TypeError:
+            return self._encoder.encode(self.redact(fields))
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format the log message, redacting the PII fields by key
+        and the "field=" pairs of the message text. A mapping passed
+        as argument is interpolated in a message holding "%",
+        redacted, else rendered after the message
+        """
+        fields = self.fields_of(record)
+        args = record.args
+        if fields is not None and fields is record.msg:
+            message = ''
+        elif args and type(args) is not tuple and isinstance(args, Mapping):
+            message = str(record.msg)
+            if '%' in message:
+                message = message % self.redact(args)
+                if fields is args:
+                    fields = None
+            message = self.engine.redact(message)
+        else:
+            message = self.engine.redact(record.getMessage())
+        asctime = self.formatTime(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+
+        if self.json_lines:
+            quote = encode_basestring_ascii
+            line = '{"time": %s, "name": %s, "level": %s, "message": %s' % (
+                quote(asctime),
+                quote(record.name),
+                quote(record.levelname),
+                quote(message)
+            )
+            if fields is not None:
+                line = '%s, "fields": %s' % (line, self.render_json(fields))
+            if record.exc_text:
+                line = '%s, "exc_info": %s' % (line, quote(record.exc_text))
+
+            return line + '}'
+
+        if fields is not None:
+            pairs = self.render(fields)
+            message = '{} {}'.format(message, pairs) if message else pairs
+        text = self.FORMAT % {
+            'name': record.name,
+            'levelname': record.levelname,
+            'asctime': asctime,
+            'message': message
+        }
+        if record.exc_text:
+            text = '{}\n{}'.format(text, record.exc_text)
+
+        return text
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler to a bounded queue which, when the queue is full,
+    drops the record and counts it, or blocks if block is set.
+    Records are enqueued as they are: formatting and redaction are
+    left to the handlers of the listener
+    """
+    def __init__(self, records: queue.Queue, block: bool = False):
+        """
+        Initialization method
+        """
+        super(BoundedQueueHandler, self).__init__(records)
+        self.block = block
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Enqueue the record untouched
+        """
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put the record in the queue, or drop it if full
+        """
+        if self.block:
+            self.queue.put(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener whose stop waits for room in a full queue, so the
+    records queued before it are all handled
+    """
+    def enqueue_sentinel(self) -> None:
+        """Put the stop sentinel in the queue
+        """
+        self.queue.put(self._sentinel)
 
 
 def get_logger() -> logging.Logger:
     """
-    Get a logger instance
+    Get a logger instance, configured on the first call only
     """
     logger = logging.getLogger('user_data')
+    if logger.handlers:
+        return logger
+
     logger.setLevel(logging.INFO)
     logger.propagate = False
     handler = logging.StreamHandler()
@@ -60,10 +307,48 @@ def get_logger() -> logging.Logger:
     return logger
 
 
-def get_db() -> mysql.connector.connection.MySQLConnection:
+def get_queue_logger() -> logging.Logger:
+    """
+    Get a logger instance whose calls only enqueue the record: a
+    listener thread redacts and writes it. The queue holds
+    LOG_QUEUE_SIZE records, beyond which LOG_QUEUE_POLICY "drop"
+    drops records, counted in the dropped attribute of the handler,
+    and "block" waits. Configured on the first call only, the
+    listener is stopped at exit once the queue is drained
+    Named "user_data.queue" so that it is configured independently
+    of the get_logger() one, whichever is called first
+    """
+    logger = logging.getLogger('user_data.queue')
+    if logger.handlers:
+        return logger
+
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    records = queue.Queue(LOG_QUEUE_SIZE)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(RedactingFormatter(PII_FIELDS))
+    listener = DrainingQueueListener(
+        records,
+        stream_handler,
+        respect_handler_level=True
+    )
+    logger.addHandler(
+        BoundedQueueHandler(records, block=LOG_QUEUE_POLICY == "block")
+    )
+    listener.start()
+    atexit.register(listener.stop)
+
+    return logger
+
+
+def get_db() -> 'mysql.connector.connection.MySQLConnection':
     """
     Get a database connection
+    mysql.connector is imported here so that the redaction helpers
+    can be used without it
     """
+    import mysql.connector
+
     db_host = getenv("PERSONAL_DATA_DB_HOST", "localhost")
     db_name = getenv("PERSONAL_DATA_DB_NAME", "")
     db_user = getenv("PERSONAL_DATA_DB_USERNAME", "root")
@@ -78,10 +363,69 @@ def get_db() -> mysql.connector.connection.MySQLConnection:
     return connection
 
 
+def export_users(
+    db: 'mysql.connector.connection.MySQLConnection',
+    out: t.TextIO = None,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> int:
+    """
+    Write the users table to out (default stdout) in the log format,
+    batch_size rows at a time from an unbuffered cursor, the
+    PII_FIELDS columns redacted by position: a PII value holding the
+    separator is redacted whole. The time is taken once per batch
+    Report the throughput on stderr and return the number of rows
+    """
+    if out is None:
+        out = open(sys.stdout.fileno(), 'w', buffering=1 << 20,
+                   closefd=False)
+    logger = logging.getLogger('user_data')
+    formatter = RedactingFormatter(PII_FIELDS)
+    start = time.monotonic()
+    count = 0
+    with db.cursor(buffered=False) as cursor:
+        cursor.execute("SELECT * FROM users;")
+        columns = [column[0] for column in cursor.description]
+        kept = [i for i, name in enumerate(columns) if name not in PII_FIELDS]
+        template = '; '.join(
+            '{}={}'.format(name, RedactingFormatter.REDACTION)
+            .replace('{', '{{').replace('}', '}}')
+            if name in PII_FIELDS
+            else '{}='.format(name).replace('{', '{{').replace('}', '}}')
+            + '{}'
+            for name in columns
+        ) + ';\n'
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+
+            record = logger.makeRecord(
+                logger.name, logging.INFO, __file__, 0, '', None, None
+            )
+            prefix = logging.Formatter.format(formatter, record)
+            out.writelines(
+                prefix + template.format(*[row[i] for i in kept])
+                for row in rows
+            )
+            count += len(rows)
+    out.flush()
+    elapsed = time.monotonic() - start
+    print("{} rows in {:.2f}s ({:.0f} rows/s)".format(
+        count, elapsed, count / elapsed if elapsed else 0
+    ), file=sys.stderr)
+
+    return count
+
+
 def main() -> None:
     """
     Fetch users from a db, and display user details
+    With --stream, export them in batches instead, see export_users
     """
+    if '--stream' in sys.argv[1:]:
+        export_users(get_db())
+        return
+
     fields = 'name,email,phone,ssn,password,ip,last_login,user_agent'
     fields = fields.split(',')
 
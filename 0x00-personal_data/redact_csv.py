@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Redact the PII_FIELDS columns of a CSV dump such as user_data.csv
+Usage: ./redact_csv.py INPUT [OUTPUT, default stdout]
+The input is mapped in memory and split into byte ranges of about
+REDACT_CHUNK_SIZE bytes (default 16 MiB) ending on a newline, redacted
+on REDACT_WORKERS processes (default: CPU count) and written in order.
+Records must not hold newlines inside quoted values
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from os import getenv
+import csv
+import io
+import mmap
+import os
+import sys
+import typing as t
+
+from filtered_logger import PII_FIELDS, RedactingFormatter
+
+
+def chunk_ranges(
+    mm: mmap.mmap,
+    start: int,
+    chunk_size: int
+) -> t.Iterator[t.Tuple[int, int]]:
+    """
+    Yield (start, end) byte ranges from start covering mm, each
+    ending right after a newline or at the end of mm
+    """
+    size = len(mm)
+    while start < size:
+        end = mm.find(b'\n', min(start + chunk_size, size) - 1)
+        end = size if end == -1 else end + 1
+        yield start, end
+        start = end
+
+
+def redact_range(
+    path: str,
+    start: int,
+    end: int,
+    columns: t.Tuple[int, ...]
+) -> bytes:
+    """
+    Return the records of path between start and end, columns redacted
+    """
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = mm[start:end].decode('utf-8')
+    out = io.StringIO()
+    writer = csv.writer(out, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    for row in csv.reader(io.StringIO(text, newline='')):
+        for column in columns:
+            if column < len(row):
+                row[column] = RedactingFormatter.REDACTION
+        writer.writerow(row)
+
+    return out.getvalue().encode('utf-8')
+
+
+def redact_csv(
+    path: str,
+    out: t.BinaryIO,
+    workers: int = None,
+    chunk_size: int = 16 << 20
+) -> None:
+    """
+    Write path to out with the PII_FIELDS columns redacted, holding
+    at most two chunks per worker in memory
+    """
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    with mm:
+        header_end = mm.find(b'\n') + 1 or len(mm)
+        header = next(csv.reader([mm[:header_end].decode('utf-8')]))
+        columns = tuple(
+            i for i, name in enumerate(header) if name in PII_FIELDS
+        )
+        out.write(mm[:header_end])
+        ranges = list(chunk_ranges(mm, header_end, chunk_size))
+
+    workers = workers or os.cpu_count() or 1
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for start, end in ranges:
+            if len(pending) >= 2 * workers:
+                out.write(pending.popleft().result())
+            pending.append(
+                executor.submit(redact_range, path, start, end, columns)
+            )
+        while pending:
+            out.write(pending.popleft().result())
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit(__doc__.strip().split('\n')[1])
+
+    workers = getenv('REDACT_WORKERS')
+    out = open(sys.argv[2], 'wb') if len(sys.argv) > 2 else sys.stdout.buffer
+    with out:
+        redact_csv(
+            sys.argv[1],
+            out,
+            int(workers) if workers else None,
+            int(getenv('REDACT_CHUNK_SIZE', 16 << 20))
+        )
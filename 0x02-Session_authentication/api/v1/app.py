@@ -11,6 +11,7 @@ from api.v1.auth.basic_auth import BasicAuth
 from api.v1.auth.session_auth import SessionAuth
 from api.v1.auth.session_exp_auth import SessionExpAuth
 from api.v1.auth.session_db_auth import SessionDBAuth
+from api.v1.auth.path_matcher import PathMatcher
 
 
 app = Flask(__name__)
@@ -28,19 +29,19 @@ elif auth == 'session_exp_auth':
 elif auth == 'session_db_auth':
     auth = SessionDBAuth()
 
+excluded_paths = PathMatcher([
+    '/api/v1/stat*',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+    '/api/v1/auth_session/login/'
+])
+
 
 @app.before_request
 def validate_user():
     """
     Validate users before handling requests
     """
-    excluded_paths = [
-        '/api/v1/stat*',
-        '/api/v1/unauthorized/',
-        '/api/v1/forbidden/',
-        '/api/v1/auth_session/login/'
-    ]
-
     if ((auth is not None) and
             auth.require_auth(request.path, excluded_paths)):
         if (auth.authorization_header(request) is None and
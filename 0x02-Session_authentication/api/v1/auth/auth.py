@@ -3,6 +3,7 @@
 Provide authentication implementation
 """
 from flask import request
+from api.v1.auth.path_matcher import PathMatcher, compile_paths
 import typing as t
 from werkzeug.wrappers import Request
 from os import getenv
@@ -14,24 +15,21 @@ class Auth:
     """
     Base class for basic user authentication
     """
-    def require_auth(self, path: str, excluded_paths: t.List[str]) -> bool:
+    def require_auth(
+        self,
+        path: str,
+        excluded_paths: t.Union[t.List[str], PathMatcher]
+    ) -> bool:
         """
         Check if path requires authentication
         """
         if (path is None) or (not excluded_paths):
             return True
 
-        if not path.endswith('/'):
-            path += '/'
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = compile_paths(tuple(excluded_paths))
 
-        for excluded_path in excluded_paths:
-            if excluded_path.endswith('*'):
-                excluded_path = excluded_path[:-1]
-
-            if excluded_path in path:
-                return False
-
-        return True
+        return not excluded_paths.match(path)
 
     def authorization_header(self, request: Request = None) -> str:
         """
@@ -6,9 +6,13 @@ from api.v1.auth.auth import (
    Auth,
    UserType
 )
+from api.v1.auth.cache import LRUCache
 import base64
 import binascii
+import hashlib
+import secrets
 import typing as t
+from os import getenv
 from models.user import User
 from werkzeug.wrappers import Request
 
@@ -17,6 +21,12 @@ class BasicAuth(Auth):
     """
     Implement basic authentication
     """
+    credentials_cache = LRUCache(
+        maxsize=int(getenv('BASIC_AUTH_CACHE_SIZE', 1024)),
+        ttl=float(getenv('BASIC_AUTH_CACHE_TTL', 300))
+    )
+    credentials_cache_key = secrets.token_bytes(32)
+
     def extract_base64_authorization_header(
         self,
         authorization_header: str
@@ -101,13 +111,59 @@ class BasicAuth(Auth):
         except Exception:
             return None
 
+    def credentials_digest(self, authorization_header: str) -> bytes:
+        """
+        Keyed hash of an authorization header, used as cache key
+        so that credentials are never kept in memory
+        """
+        if ((authorization_header is None) or
+                not isinstance(authorization_header, str)):
+            return None
+
+        return hashlib.blake2b(
+            authorization_header.encode('utf-8'),
+            key=self.credentials_cache_key,
+            digest_size=16
+        ).digest()
+
+    def cached_user(self, digest: bytes) -> UserType:
+        """
+        Get the user verified with the same authorization header,
+        unless the user has been removed or its email or password
+        has changed since
+        """
+        entry = self.credentials_cache.get(digest)
+        if entry is None:
+            return None
+
+        user_id, email, password = entry
+        user = User.get(user_id)
+        if (user is None or user.email != email or
+                user.password != password):
+            self.credentials_cache.pop(digest)
+            return None
+
+        return user
+
     def current_user(self, request: Request = None) -> UserType:
         """
         Get the current authenticated user
         """
         auth_header = self.authorization_header(request)
+        digest = self.credentials_digest(auth_header)
+        if digest is not None:
+            user = self.cached_user(digest)
+            if user is not None:
+                return user
+
         base64_auth = self.extract_base64_authorization_header(auth_header)
         auth = self.decode_base64_authorization_header(base64_auth)
         credentials = self.extract_user_credentials(auth)
-
-        return self.user_object_from_credentials(*credentials)
+        user = self.user_object_from_credentials(*credentials)
+        if user is not None and digest is not None:
+            self.credentials_cache.set(
+                digest,
+                (user.id, user.email, user.password)
+            )
+
+        return user
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Provide a bounded in-memory cache
+"""
+from collections import OrderedDict
+import threading
+import time
+import typing as t
+
+
+class LRUCache:
+    """
+    Thread-safe cache keeping at most maxsize entries, each for at
+    most ttl seconds (forever if ttl <= 0); least recently used
+    entries are evicted first
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float = 0) -> None:
+        """
+        Initialization method
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: t.Hashable, default: t.Any = None) -> t.Any:
+        """
+        Get the value of a key, default if missing or expired
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self.entries[key]
+                self.misses += 1
+                return default
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: t.Hashable, value: t.Any,
+            ttl: float = None) -> None:
+        """
+        Set the value of a key, for ttl seconds if given
+        """
+        if ttl is None:
+            ttl = self.ttl
+        expires_at = time.monotonic() + ttl if ttl > 0 else None
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def pop(self, key: t.Hashable, default: t.Any = None) -> t.Any:
+        """
+        Remove a key and return its value
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        """
+        Remove every entry
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        """
+        Number of entries, expired ones included
+        """
+        return len(self.entries)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Provide a matcher for paths excluded from authentication
+"""
+import functools
+import typing as t
+
+_END = ''
+
+
+class PathMatcher:
+    """
+    Match paths against excluded paths, compiled once:
+    - '/api/v1/status/' matches '/api/v1/status' and '/api/v1/status/'
+    - '/api/v1/stat*' matches every path starting with '/api/v1/stat'
+    Matching costs O(len(path)), whatever the number of excluded paths
+    """
+    def __init__(self, excluded_paths: t.Iterable[str] = ()):
+        """
+        Initialization method
+        """
+        self.exact = set()
+        self.prefixes = {}
+        self.size = 0
+        for excluded_path in excluded_paths:
+            self.add(excluded_path)
+
+    def add(self, excluded_path: str) -> None:
+        """
+        Add an excluded path, a prefix if it ends with '*'
+        """
+        self.size += 1
+        if excluded_path.endswith('*'):
+            node = self.prefixes
+            for char in excluded_path[:-1]:
+                node = node.setdefault(char, {})
+            node[_END] = True
+        else:
+            if not excluded_path.endswith('/'):
+                excluded_path += '/'
+            self.exact.add(excluded_path)
+
+    def match(self, path: str) -> bool:
+        """
+        Check if path is excluded
+        """
+        if not path.endswith('/'):
+            path += '/'
+
+        if path in self.exact:
+            return True
+
+        node = self.prefixes
+        for char in path:
+            if _END in node:
+                return True
+            node = node.get(char)
+            if node is None:
+                return False
+
+        return _END in node
+
+    def __len__(self) -> int:
+        """
+        Number of excluded paths
+        """
+        return self.size
+
+
+@functools.lru_cache(maxsize=128)
+def compile_paths(excluded_paths: t.Tuple[str, ...]) -> PathMatcher:
+    """
+    Get the matcher of a list of excluded paths, compiled once
+    """
+    return PathMatcher(excluded_paths)
@@ -2,19 +2,51 @@
 """
 Module for Persistent Session Authentication
 """
+from api.v1.auth.cache import LRUCache
 from api.v1.auth.session_exp_auth import SessionExpAuth
 from models.user_session import UserSession
 from werkzeug.wrappers import Request
+from os import getenv
 from datetime import (
     datetime,
     timedelta
 )
+import typing as t
 
 
 class SessionDBAuth(SessionExpAuth):
     """
     Implement persistent session authentication
     """
+    session_cache = LRUCache(
+        maxsize=int(getenv('SESSION_CACHE_SIZE', 10000))
+    )
+
+    def cache_session(
+        self,
+        user_session: UserSession
+    ) -> t.Optional[t.Tuple[str, datetime]]:
+        """
+        Cache (user id, expiry time) of a session, expiry time is
+        None if sessions don't expire
+        """
+        expire_time = None
+        ttl = 0
+        if self.session_duration > 0:
+            if user_session.created_at is None:
+                return None
+
+            expire_time = (user_session.created_at
+                           + timedelta(seconds=self.session_duration))
+            ttl = (expire_time - datetime.now()).total_seconds()
+            if ttl <= 0:
+                return None
+
+        entry = (user_session.user_id, expire_time)
+        self.session_cache.set(user_session.session_id, entry, ttl)
+
+        return entry
+
     def create_session(self, user_id: str = None) -> str:
         """
         Create a user session
@@ -29,6 +61,7 @@ class SessionDBAuth(SessionExpAuth):
         )
 
         user_session.save()
+        self.cache_session(user_session)
 
         return session_id
 
@@ -40,24 +73,26 @@ class SessionDBAuth(SessionExpAuth):
             return None
 
         try:
-            sessions = UserSession.search({'session_id': session_id})
-            if len(sessions) >= 1:
-                user_session = sessions[0]
-                if self.session_duration <= 0:
-                    return user_session.user_id
-
-                if user_session.created_at is None:
+            entry = self.session_cache.get(session_id)
+            if entry is None:
+                sessions = UserSession.search({'session_id': session_id})
+                if len(sessions) == 0:
                     return None
 
-                expire_time = (user_session.created_at
-                               + timedelta(seconds=self.session_duration))
-
-                if expire_time < datetime.now():
+                entry = self.cache_session(sessions[0])
+                if entry is None:
+                    return None
+                if UserSession.get(sessions[0].id) is None:
+                    # removed by a logout while being cached
+                    self.session_cache.pop(session_id)
                     return None
 
-                return user_session.user_id
+            user_id, expire_time = entry
+            if expire_time is not None and expire_time < datetime.now():
+                self.session_cache.pop(session_id)
+                return None
 
-            return None
+            return user_id
         except Exception:
             return None
 
@@ -69,6 +104,7 @@ class SessionDBAuth(SessionExpAuth):
         if request is None or session_id is None:
             return False
 
+        self.session_cache.pop(session_id)
         try:
             sessions = UserSession.search({'session_id': session_id})
             if len(sessions) >= 1:
@@ -79,3 +115,6 @@ class SessionDBAuth(SessionExpAuth):
             return False
         except Exception:
             return False
+        finally:
+            # a lookup racing the removal may have cached it again
+            self.session_cache.pop(session_id)
@@ -8,12 +8,22 @@ from datetime import (
     datetime,
     timedelta
 )
+import heapq
+import threading
+import time
+import typing as t
 
 
 class SessionExpAuth(SessionAuth):
     """
     Implement Expirable session authentication
     """
+    expiry_heap = []
+    expiry_lock = threading.Lock()
+    reaper = None
+    reaped_last_cycle = 0
+    reaped_total = 0
+
     def __init__(self) -> None:
         """
         Initialization method
@@ -24,6 +34,13 @@ class SessionExpAuth(SessionAuth):
         except TypeError:
             self.session_duration = 0
 
+        try:
+            reap_interval = float(getenv('SESSION_REAP_INTERVAL', 60))
+        except ValueError:
+            reap_interval = 0
+        if reap_interval > 0 and self.session_duration > 0:
+            self.start_reaper(reap_interval)
+
     def create_session(self, user_id: str = None) -> str:
         """
         Create session for user
@@ -32,13 +49,20 @@ class SessionExpAuth(SessionAuth):
         if session_id is None:
             return None
 
+        created_at = datetime.now()
         self.user_id_by_session_id.update({
             session_id: {
                 'user_id': user_id,
-                'created_at': datetime.now()
+                'created_at': created_at
             }
         })
 
+        if self.session_duration > 0:
+            expire_time = (created_at
+                           + timedelta(seconds=self.session_duration))
+            with self.expiry_lock:
+                heapq.heappush(self.expiry_heap, (expire_time, session_id))
+
         return session_id
 
     def user_id_for_session_id(self, session_id: str = None) -> str:
@@ -65,3 +89,79 @@ class SessionExpAuth(SessionAuth):
             return None
 
         return user_session.get('user_id')
+
+    def reap_expired_sessions(self, max_batch: int = 1000) -> int:
+        """
+        Delete at most max_batch expired sessions, soonest expiry
+        first, and return the number deleted
+        """
+        now = datetime.now()
+        duration = timedelta(seconds=self.session_duration)
+        reaped = 0
+        with self.expiry_lock:
+            heap = self.expiry_heap
+            for _ in range(max_batch):
+                if not heap or heap[0][0] >= now:
+                    break
+
+                session_id = heapq.heappop(heap)[1]
+                user_session = self.user_id_by_session_id.get(session_id)
+                if (isinstance(user_session, dict) and
+                        user_session.get('created_at') is not None and
+                        user_session.get('created_at') + duration < now):
+                    if self.user_id_by_session_id.pop(session_id, None):
+                        reaped += 1
+
+        return reaped
+
+    def reap_cycle(self, max_batch: int = 1000) -> int:
+        """
+        Reap expired sessions batch by batch, releasing the lock
+        between batches, and record the metrics of the cycle
+        """
+        started_at = datetime.now()
+        reaped = 0
+        while True:
+            reaped += self.reap_expired_sessions(max_batch)
+            heap = self.expiry_heap
+            if not heap or heap[0][0] >= started_at:
+                break
+
+        SessionExpAuth.reaped_last_cycle = reaped
+        SessionExpAuth.reaped_total += reaped
+
+        return reaped
+
+    def start_reaper(self, interval: float) -> None:
+        """
+        Start the background thread reaping every interval seconds
+        """
+        with self.expiry_lock:
+            if SessionExpAuth.reaper is not None:
+                return
+
+            def run():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.reap_cycle()
+                    except Exception:
+                        pass
+
+            SessionExpAuth.reaper = threading.Thread(
+                target=run,
+                daemon=True,
+                name='session-reaper'
+            )
+            SessionExpAuth.reaper.start()
+
+    def session_metrics(self) -> t.Dict[str, int]:
+        """
+        Get the live and reaped session counters
+        """
+        return {
+            'live_sessions': len(self.user_id_by_session_id),
+            'pending_expiries': len(self.expiry_heap),
+            'reaped_last_cycle': self.reaped_last_cycle,
+            'reaped_total': self.reaped_total
+        }
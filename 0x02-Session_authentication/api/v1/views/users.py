@@ -2,18 +2,112 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import abort, json, jsonify, request, Response, stream_with_context
 from models.user import User
+import base64
+import binascii
+import typing as t
+
+STREAM_CHUNK_SIZE = 100
+STREAM_PAGE_SIZE = 1000
+
+
+def encode_cursor(user_id: str) -> str:
+    """ Opaque cursor of the page following user_id
+    """
+    return base64.urlsafe_b64encode(user_id.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    """ Id encoded by a cursor, ValueError if it is invalid
+    """
+    try:
+        user_id = base64.b64decode(cursor.encode(), altchars=b'-_',
+                                   validate=True).decode()
+    except (binascii.Error, UnicodeError):
+        raise ValueError
+    if not user_id:
+        raise ValueError
+    return user_id
+
+
+def project(user: User, fields: t.List[str] = None) -> dict:
+    """ JSON representation of a user, restricted to fields if given
+    """
+    user_json = user.to_json()
+    if fields is None:
+        return user_json
+
+    return {k: user_json[k] for k in fields if k in user_json}
+
+
+def stream_users(user_ids: t.List[str],
+                 fields: t.List[str] = None) -> t.Iterator[str]:
+    """ Yield a JSON array of users, STREAM_CHUNK_SIZE users per chunk
+    """
+    yield '['
+    sep = ''
+    for i in range(0, len(user_ids), STREAM_CHUNK_SIZE):
+        chunk = []
+        for user_id in user_ids[i:i + STREAM_CHUNK_SIZE]:
+            user = User.get(user_id)
+            if user is not None:
+                chunk.append(sep + json.dumps(project(user, fields)))
+                sep = ','
+        yield ''.join(chunk)
+    yield ']'
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters:
+      - limit (optional): maximum number of users returned
+      - cursor (optional): cursor of the page, from X-Next-Cursor
+      - fields (optional): comma separated attributes to return
+      - stream (optional): 1 to stream the JSON array, in pages of
+        STREAM_PAGE_SIZE users unless limit is given
     Return:
-      - list of all User objects JSON represented
+      - list of User objects JSON represented, in id order
+      - X-Next-Cursor header if more users remain
+      - 400 if limit or cursor is invalid
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    try:
+        limit = request.args.get('limit')
+        limit = None if limit is None else int(limit)
+        after = request.args.get('cursor')
+        after = None if after is None else decode_cursor(after)
+        if limit is not None and limit <= 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': "Wrong format"}), 400
+    fields = request.args.get('fields')
+    if fields is not None:
+        fields = [field for field in fields.split(',') if field]
+    stream = request.args.get('stream') in ('1', 'true')
+    if stream and limit is None:
+        limit = STREAM_PAGE_SIZE
+
+    if limit is None:
+        user_ids = User.ids(after)
+        next_cursor = None
+    else:
+        user_ids = User.ids(after, limit + 1)
+        next_cursor = None
+        if len(user_ids) > limit:
+            user_ids = user_ids[:limit]
+            next_cursor = encode_cursor(user_ids[-1])
+
+    if stream:
+        resp = Response(stream_with_context(stream_users(user_ids, fields)),
+                        mimetype='application/json')
+    else:
+        users = [User.get(user_id) for user_id in user_ids]
+        resp = jsonify([project(user, fields)
+                        for user in users if user is not None])
+    if next_cursor is not None:
+        resp.headers['X-Next-Cursor'] = next_cursor
+    return resp
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: bytes per UserSession held in memory
+Usage: ./bench_memory.py [number of sessions, default 1000000]
+"""
+from datetime import datetime
+import sys
+import tracemalloc
+import uuid
+
+from models.user_session import UserSession
+
+
+class LegacySession():
+    """
+    UserSession layout before slots: a __dict__ and two datetimes
+    """
+    def __init__(self, user_id: str, session_id: str):
+        """
+        Initialization method
+        """
+        self.id = str(uuid.uuid4())
+        self.created_at = datetime.now()
+        self.updated_at = datetime.now()
+        self.user_id = user_id
+        self.session_id = session_id
+
+
+def measure(factory, count: int, user_ids: list) -> float:
+    """
+    Return the bytes held per object built by factory, once each was
+    serialized as on save(); user ids are fresh strings as when decoded
+    from a file
+    """
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    objs = [factory(user_id=user_ids[i % len(user_ids)].encode().decode(),
+                    session_id=str(uuid.uuid4()))
+            for i in range(count)]
+    for obj in objs:
+        if hasattr(obj, 'to_json'):
+            obj.to_json(True)
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del objs
+
+    return size / count
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    user_ids = [str(uuid.uuid4()) for _ in range(1000)]
+    before = measure(LegacySession, count, user_ids)
+    after = measure(UserSession, count, user_ids)
+    print("{} sessions".format(count))
+    print("before: {:.0f} bytes/session".format(before))
+    print("after:  {:.0f} bytes/session ({:.0%} saved)".format(
+        after, 1 - after / before))
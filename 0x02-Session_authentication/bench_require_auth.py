@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: Auth.require_auth against the former loop
+Usage: ./bench_require_auth.py [number of excluded paths, default 40]
+"""
+import sys
+import timeit
+
+from api.v1.auth.auth import Auth
+from api.v1.auth.path_matcher import PathMatcher
+
+
+def legacy_require_auth(path: str, excluded_paths: list) -> bool:
+    """
+    Former implementation: strip '*' and substring test per path
+    """
+    if (path is None) or (not excluded_paths):
+        return True
+
+    if not path.endswith('/'):
+        path += '/'
+
+    for excluded_path in excluded_paths:
+        if excluded_path.endswith('*'):
+            excluded_path = excluded_path[:-1]
+
+        if excluded_path in path:
+            return False
+
+    return True
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    excluded_paths = ['/api/v1/stat*', '/api/v1/auth_session/login/']
+    for i in range(count - len(excluded_paths)):
+        if i % 2:
+            excluded_paths.append('/api/v1/public_{}/'.format(i))
+        else:
+            excluded_paths.append('/api/v1/assets_{}/*'.format(i))
+    matcher = PathMatcher(excluded_paths)
+    auth = Auth()
+    number = 100000
+
+    print("{} excluded paths, {} calls".format(len(excluded_paths), number))
+    for path in ['/api/v1/users/me', '/api/v1/status', '/api/v1/assets_4/x']:
+        legacy = timeit.timeit(
+            lambda: legacy_require_auth(path, excluded_paths), number=number)
+        compiled = timeit.timeit(
+            lambda: auth.require_auth(path, matcher), number=number)
+        print("{:<22} legacy {:.3f}us  matcher {:.3f}us".format(
+            path, legacy / number * 1e6, compiled / number * 1e6))
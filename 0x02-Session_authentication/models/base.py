@@ -1,21 +1,125 @@
 #!/usr/bin/env python3
 """ Base module
 """
-from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import TypeVar, List, Iterable, Optional, Tuple
+from models.storage import get_storage, LazyObjects, SnapshotRecords
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
 DATA = {}
+INDEXES = {}
+SORTED_IDS = {}
 BaseType = TypeVar('Base')
 
 
+class _Index():
+    """ Hash index of one attribute: value -> ids
+    Entries follow the current values of the stored objects: Base
+    re-indexes an object on save() and on assignment of the attribute
+    """
+
+    def __init__(self, attribute: str):
+        """ Initialize an empty index
+        """
+        self.attribute = attribute
+        self.buckets = {}
+        self.values = {}
+        self.unhashable = {}
+
+    def add(self, obj_id: str, value):
+        """ Index (or re-index) the value of an object
+        """
+        if obj_id in self.values:
+            old_value = self.values[obj_id]
+            if old_value is value or old_value == value:
+                return
+        self.discard(obj_id)
+        try:
+            self.buckets.setdefault(value, {})[obj_id] = None
+        except TypeError:
+            self.unhashable[obj_id] = None
+            return
+        self.values[obj_id] = value
+
+    def discard(self, obj_id: str):
+        """ Remove an object from the index
+        """
+        self.unhashable.pop(obj_id, None)
+        if obj_id not in self.values:
+            return
+        value = self.values.pop(obj_id)
+        bucket = self.buckets[value]
+        del bucket[obj_id]
+        if len(bucket) == 0:
+            del self.buckets[value]
+
+    def lookup(self, value) -> Optional[List[str]]:
+        """ Return the ids of objects whose attribute may equal value,
+        or None if value can't be looked up by hash
+        """
+        try:
+            bucket = self.buckets.get(value)
+        except TypeError:
+            return None
+        obj_ids = [] if bucket is None else list(bucket)
+        if len(self.unhashable) > 0:
+            obj_ids.extend(self.unhashable)
+        return obj_ids
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ Parse a TIMESTAMP_FORMAT string
+    """
+    if len(value) == 19 and value[10] == 'T':
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def _to_timestamp(value: datetime):
+    """ Pack a naive datetime into microseconds since EPOCH
+    """
+    if type(value) is datetime and value.tzinfo is None:
+        return (value - EPOCH) // MICROSECOND
+    return value
+
+
+def _from_timestamp(value) -> datetime:
+    """ Unpack microseconds since EPOCH into a datetime
+    """
+    if type(value) is int:
+        return EPOCH + timedelta(microseconds=value)
+    return value
+
+
 class Base():
     """ Base class
+    Attributes are slots, with no __dict__: only the declared ones
+    can be set. Timestamps are kept as integers and only turned into
+    datetime objects when read
     """
+    __slots__ = ('id', '_created_at', '_updated_at')
+    _attributes: Tuple[str, ...] = ()
+    indexed_attributes: Tuple[str, ...] = ()
+    storage = get_storage()
+
+    def __init_subclass__(cls, **kwargs: dict):
+        """ Collect the slots of a subclass, in declaration order
+        """
+        super().__init_subclass__(**kwargs)
+        slots = cls.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        cls._attributes = cls._attributes + tuple(
+            slot for slot in slots if slot not in ('__dict__', '__weakref__')
+        )
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
@@ -25,16 +129,66 @@ class Base():
             DATA[s_class] = {}
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
+        now = datetime.now()
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = parse_timestamp(kwargs.get('created_at'))
         else:
-            self.created_at = datetime.now()
+            self.created_at = now
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = parse_timestamp(kwargs.get('updated_at'))
+        elif self.created_at == now:
+            self._updated_at = self._created_at
+        else:
+            self.updated_at = now
+
+    @property
+    def created_at(self) -> datetime:
+        """ Getter of the creation date
+        """
+        return _from_timestamp(self._created_at)
+
+    @created_at.setter
+    def created_at(self, value: datetime):
+        """ Setter of the creation date
+        """
+        self._created_at = _to_timestamp(value)
+
+    @property
+    def updated_at(self) -> datetime:
+        """ Getter of the last update date
+        """
+        return _from_timestamp(self._updated_at)
+
+    @updated_at.setter
+    def updated_at(self, value: datetime):
+        """ Setter of the last update date
+        """
+        self._updated_at = _to_timestamp(value)
+
+    def __setattr__(self, name: str, value):
+        """ Set an attribute, re-indexing the object if it is stored
+        and the attribute is indexed
+        """
+        super().__setattr__(name, value)
+        if name in self.indexed_attributes:
+            self._reindex(name, value)
+
+    def _reindex(self, attr: str, value):
+        """ Update the index of attr with the new value of the object,
+        if it is the stored object of its id and the indexes are built
+        """
+        s_class = self.__class__.__name__
+        indexes = INDEXES.get(s_class)
+        obj_id = getattr(self, 'id', None)
+        if indexes is None or attr not in indexes or obj_id is None:
+            return
+        objs = DATA.get(s_class)
+        if isinstance(objs, LazyObjects):
+            stored = objs.built(obj_id)
         else:
-            self.updated_at = datetime.now()
+            stored = objs.get(obj_id) if objs is not None else None
+        if stored is self:
+            indexes[attr].add(obj_id, value)
 
     def __eq__(self, other: BaseType) -> bool:
         """ Equality
@@ -49,7 +203,14 @@ class Base():
         """ Convert the object a JSON dictionary
         """
         result = {}
-        for key, value in self.__dict__.items():
+        attributes = [('id', self.id),
+                      ('created_at', self.created_at),
+                      ('updated_at', self.updated_at)]
+        for key in self._attributes:
+            if hasattr(self, key):
+                attributes.append((key, getattr(self, key)))
+        attributes.extend(getattr(self, '__dict__', {}).items())
+        for key, value in attributes:
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
@@ -61,46 +222,97 @@ class Base():
     @classmethod
     def load_from_file(cls):
         """ Load all objects from file
+        In lazy mode objects are only built when first accessed,
+        and indexes on the first search or save
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
+        records = cls.storage.load(s_class)
+        SORTED_IDS[s_class] = None
+        if isinstance(records, SnapshotRecords):
+            DATA[s_class] = LazyObjects(records, lambda j: cls(**j))
+            INDEXES[s_class] = None
             return
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        DATA[s_class] = {}
+        INDEXES[s_class] = cls._new_indexes()
+        for obj_id, obj_json in records.items():
+            DATA[s_class][obj_id] = cls(**obj_json)
+        cls._index_all()
+
+    @classmethod
+    def _new_indexes(cls) -> dict:
+        """ Build empty indexes for the declared indexed attributes
+        """
+        return {attr: _Index(attr) for attr in cls.indexed_attributes}
+
+    @classmethod
+    def _indexes(cls) -> dict:
+        """ Return the indexes of the class, attribute -> _Index
+        """
+        s_class = cls.__name__
+        if INDEXES.get(s_class) is None:
+            INDEXES[s_class] = cls._new_indexes()
+            cls._index_all()
+        return INDEXES[s_class]
+
+    @classmethod
+    def _index_all(cls):
+        """ Index every loaded object
+        """
+        s_class = cls.__name__
+        objs = DATA.get(s_class, {})
+        for attr, index in INDEXES[s_class].items():
+            if isinstance(objs, LazyObjects):
+                values = objs.attribute_values(attr)
+            else:
+                values = ((obj_id, getattr(obj, attr, None))
+                          for obj_id, obj in objs.items())
+            for obj_id, value in values:
+                index.add(obj_id, value)
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        cls.storage.dump(s_class, DATA[s_class])
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def flush(cls):
+        """ Write all pending changes to file
+        """
+        cls.storage.flush()
 
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
         self.updated_at = datetime.now()
+        if self.id not in DATA[s_class]:
+            sorted_ids = SORTED_IDS.get(s_class)
+            if sorted_ids is not None:
+                insort(sorted_ids, self.id)
         DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        for attr, index in self.__class__._indexes().items():
+            index.add(self.id, getattr(self, attr, None))
+        self.__class__.storage.commit(s_class, DATA[s_class],
+                                      {self.id: self})
 
     def remove(self):
         """ Remove object
         """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
+        if self.id in DATA[s_class]:
             del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            sorted_ids = SORTED_IDS.get(s_class)
+            if sorted_ids is not None:
+                i = bisect_left(sorted_ids, self.id)
+                if i < len(sorted_ids) and sorted_ids[i] == self.id:
+                    del sorted_ids[i]
+            for index in self.__class__._indexes().values():
+                index.discard(self.id)
+            self.__class__.storage.commit(s_class, DATA[s_class],
+                                          {self.id: None})
 
     @classmethod
     def count(cls) -> int:
@@ -113,7 +325,28 @@ class Base():
     def all(cls) -> Iterable[BaseType]:
         """ Return all objects
         """
-        return cls.search()
+        return list(DATA[cls.__name__].values())
+
+    @classmethod
+    def _sorted_ids(cls) -> List[str]:
+        """ Return the ids of the class in order, kept up to date by
+        save() and remove() once built
+        """
+        s_class = cls.__name__
+        sorted_ids = SORTED_IDS.get(s_class)
+        if sorted_ids is None or len(sorted_ids) != len(DATA[s_class]):
+            sorted_ids = SORTED_IDS[s_class] = sorted(DATA[s_class])
+        return sorted_ids
+
+    @classmethod
+    def ids(cls, after: str = None, limit: int = None) -> List[str]:
+        """ Return at most limit ids in id order, starting after
+        the given id, which doesn't need to exist anymore
+        """
+        sorted_ids = cls._sorted_ids()
+        start = 0 if after is None else bisect_right(sorted_ids, after)
+        stop = None if limit is None else start + limit
+        return sorted_ids[start:stop]
 
     @classmethod
     def get(cls, id: str) -> BaseType:
@@ -125,6 +358,7 @@ class Base():
     @classmethod
     def search(cls, attributes: dict = {}) -> List[BaseType]:
         """ Search all objects with matching attributes
+        Equality on an indexed attribute is answered from its index
         """
         s_class = cls.__name__
 
@@ -136,4 +370,16 @@ class Base():
                     return False
             return True
 
-        return list(filter(_search, DATA[s_class].values()))
+        objs = None
+        if len(attributes) > 0 and len(cls.indexed_attributes) > 0:
+            indexes = cls._indexes()
+            for k, v in attributes.items():
+                if k in indexes:
+                    obj_ids = indexes[k].lookup(v)
+                    if obj_ids is not None:
+                        objs = [DATA[s_class][i] for i in obj_ids]
+                        break
+        if objs is None:
+            objs = DATA[s_class].values()
+
+        return list(filter(_search, objs))
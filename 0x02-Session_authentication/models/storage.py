@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+""" Storage module
+"""
+from collections.abc import Mapping, MutableMapping
+from os import getenv, path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+import atexit
+import json
+import mmap
+import os
+import signal
+import threading
+
+
+class SnapshotRecords(MutableMapping):
+    """ JSON dictionaries of a snapshot file, id -> JSON dictionary
+
+    The file is memory-mapped and nothing is read at creation. The
+    first access scans the file for record offsets, and a record is
+    only decoded when it is accessed. Records that are set replace
+    the file content in memory, the file itself is never written.
+    """
+
+    def __init__(self, file_path: str):
+        """ Map a snapshot file
+        """
+        self._mmap = None
+        self._index = None
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                self._mmap = mmap.mmap(f.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+
+    def _records(self) -> dict:
+        """ Return id -> offset of the value (int) or JSON dictionary
+        """
+        if self._index is not None:
+            return self._index
+
+        mm = self._mmap
+        self._index = {}
+        if mm is None:
+            return self._index
+        if mm[:2] != b'{\n':
+            self._index = json.loads(mm[:])
+            return self._index
+
+        pos = 2
+        while pos < len(mm):
+            end = mm.find(b'\n', pos)
+            if end == -1:
+                end = len(mm)
+            if mm[pos:pos + 1] == b'}':
+                break
+            sep = mm.find(b'": ', pos, end)
+            key = mm[pos:sep + 1]
+            if b'\\' in key:
+                key = json.loads(key)
+            else:
+                key = key[1:-1].decode('utf-8')
+            self._index[key] = sep + 3
+            pos = end + 1
+        return self._index
+
+    def raw(self, key: str) -> str:
+        """ Return the JSON text of a record
+        """
+        value = self._records()[key]
+        if type(value) is not int:
+            return json.dumps(value)
+        end = self._mmap.find(b'\n', value)
+        if end == -1:
+            end = len(self._mmap)
+        if self._mmap[end - 1:end] == b',':
+            end -= 1
+        return self._mmap[value:end].decode('utf-8')
+
+    def __getitem__(self, key: str) -> dict:
+        """ Decode one record
+        """
+        value = self._records()[key]
+        if type(value) is int:
+            return json.loads(self.raw(key))
+        return value
+
+    def __setitem__(self, key: str, value: dict):
+        """ Replace one record in memory
+        """
+        self._records()[key] = value
+
+    def __delitem__(self, key: str):
+        """ Remove one record in memory
+        """
+        del self._records()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over ids in file order
+        """
+        return iter(self._records())
+
+    def __len__(self) -> int:
+        """ Number of records
+        """
+        return len(self._records())
+
+
+class LazyObjects(MutableMapping):
+    """ Objects of a class, id -> object, built from their JSON
+    dictionary by factory on first access
+    """
+
+    def __init__(self, records: SnapshotRecords,
+                 factory: Callable[[dict], object]):
+        """ Wrap the records of a snapshot
+        """
+        self._records = records
+        self._factory = factory
+        self._objects = {}
+
+    def __getitem__(self, key: str) -> object:
+        """ Return an object, building it on first access
+        """
+        obj = self._objects.get(key)
+        if obj is None:
+            obj = self._factory(self._records[key])
+            self._objects[key] = obj
+        return obj
+
+    def built(self, key: str) -> Optional[object]:
+        """ Return an object if it was already built, else None
+        """
+        return self._objects.get(key)
+
+    def __setitem__(self, key: str, obj: object):
+        """ Set an object
+        """
+        if key not in self._records:
+            self._records[key] = None
+        self._objects[key] = obj
+
+    def __delitem__(self, key: str):
+        """ Remove an object
+        """
+        del self._records[key]
+        self._objects.pop(key, None)
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over ids
+        """
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        return len(self._records)
+
+    def __contains__(self, key: str) -> bool:
+        """ Check an id without building its object
+        """
+        return key in self._records
+
+    def attribute_values(self, attr: str) -> Iterator[Tuple[str, object]]:
+        """ Yield (id, value of attr) without building objects
+        """
+        for key in list(self._records):
+            obj = self._objects.get(key)
+            if obj is not None:
+                yield key, getattr(obj, attr, None)
+            else:
+                yield key, self._records[key].get(attr)
+
+    def serialized_items(self) -> Iterator[Tuple[str, str]]:
+        """ Yield (id, JSON text), copying records never accessed
+        """
+        for key in list(self._records):
+            obj = self._objects.get(key)
+            if obj is not None:
+                yield key, json.dumps(obj.to_json(True))
+            else:
+                yield key, self._records.raw(key)
+
+
+def serialized_items(objs: Mapping) -> Iterator[Tuple[str, str]]:
+    """ Yield (id, JSON text) of every object
+    """
+    if isinstance(objs, LazyObjects):
+        return objs.serialized_items()
+    return ((obj_id, json.dumps(obj.to_json(True)))
+            for obj_id, obj in list(objs.items()))
+
+
+class FileStorage():
+    """ Store all objects of a class in one JSON file,
+    rewritten on every change
+    """
+
+    def __init__(self, lazy: bool = False):
+        """ Initialize the file storage
+        - lazy: map snapshot files instead of decoding them on load
+        """
+        self.lazy = lazy
+
+    def file_path(self, s_class: str) -> str:
+        """ Path of the snapshot file of a class
+        """
+        return ".db_{}.json".format(s_class)
+
+    def load(self, s_class: str) -> Dict[str, dict]:
+        """ Return the JSON dictionary of every stored object,
+        as SnapshotRecords in lazy mode
+        """
+        file_path = self.file_path(s_class)
+        if not path.exists(file_path):
+            return {}
+
+        if self.lazy:
+            return SnapshotRecords(file_path)
+        with open(file_path, 'r') as f:
+            return json.load(f)
+
+    def dump(self, s_class: str, objs: dict):
+        """ Write all objects of a class to the snapshot file,
+        one record per line so the file can be loaded lazily
+        """
+        file_path = self.file_path(s_class)
+        tmp_path = "{}.tmp".format(file_path)
+        with open(tmp_path, 'w') as f:
+            sep = "{\n"
+            for obj_id, obj_json in serialized_items(objs):
+                f.write("{}{}: {}".format(sep, json.dumps(obj_id), obj_json))
+                sep = ",\n"
+            f.write("{}\n" if sep == "{\n" else "\n}\n")
+        os.replace(tmp_path, file_path)
+
+    def commit(self, s_class: str, objs: dict, changes: dict):
+        """ Persist changes, a dictionary id -> object (None if removed)
+        """
+        self.dump(s_class, objs)
+
+    def flush(self):
+        """ Write pending changes, nothing is pending here
+        """
+        pass
+
+
+class JournalStorage(FileStorage):
+    """ Append one JSON line per change to a journal, and compact
+    the journal into the snapshot file once it grows too large
+    """
+
+    def __init__(self, lazy: bool = False,
+                 max_bytes: int = 4 * 1024 * 1024,
+                 ratio: float = 1.0, min_records: int = 1000,
+                 fsync: bool = False):
+        """ Initialize the journal storage
+        - lazy: map snapshot files instead of decoding them on load
+        - max_bytes: compact once the journal is larger than this
+        - ratio: compact once journal records > ratio * live objects
+        - min_records: never compact below this number of records
+        - fsync: fsync the journal after each commit
+        """
+        super().__init__(lazy)
+        self.max_bytes = max_bytes
+        self.ratio = ratio
+        self.min_records = min_records
+        self.fsync = fsync
+        self.journal_records = {}
+        self.journal_bytes = {}
+        self.locks = {}
+        self.locks_lock = threading.Lock()
+
+    def lock(self, s_class: str) -> threading.RLock:
+        """ Lock serializing the appends and compactions of a class
+        """
+        with self.locks_lock:
+            return self.locks.setdefault(s_class, threading.RLock())
+
+    def journal_path(self, s_class: str) -> str:
+        """ Path of the journal file of a class
+        """
+        return ".db_{}.journal".format(s_class)
+
+    def load(self, s_class: str) -> Dict[str, dict]:
+        """ Return the snapshot with the journal replayed on top of it.
+        Replay stops at the first torn record, which the journal is
+        truncated to, so later appends don't fuse with it
+        """
+        with self.lock(s_class):
+            objs_json = super().load(s_class)
+            records = 0
+            size = 0
+            journal_path = self.journal_path(s_class)
+            if path.exists(journal_path):
+                with open(journal_path, 'rb') as f:
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            break
+                        if record.get('op') == 'delete':
+                            objs_json.pop(record.get('id'), None)
+                        else:
+                            objs_json[record.get('id')] = record.get('data')
+                        records += 1
+                        size += len(line)
+                if size < path.getsize(journal_path):
+                    os.truncate(journal_path, size)
+            self.journal_bytes[s_class] = size
+            self.journal_records[s_class] = records
+        return objs_json
+
+    def dump(self, s_class: str, objs: dict):
+        """ Write the snapshot file and empty the journal
+        """
+        with self.lock(s_class):
+            super().dump(s_class, objs)
+            open(self.journal_path(s_class), 'w').close()
+            self.journal_records[s_class] = 0
+            self.journal_bytes[s_class] = 0
+
+    def commit(self, s_class: str, objs: dict, changes: dict):
+        """ Append the changes to the journal
+        """
+        lines = []
+        for obj_id, obj in changes.items():
+            if obj is None:
+                record = {'op': 'delete', 'id': obj_id}
+            else:
+                record = {'op': 'upsert', 'id': obj_id,
+                          'data': obj.to_json(True)}
+            lines.append(json.dumps(record))
+        data = ("\n".join(lines) + "\n").encode()
+
+        with self.lock(s_class):
+            with open(self.journal_path(s_class), 'ab') as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            records = self.journal_records.get(s_class, 0) + len(lines)
+            size = self.journal_bytes.get(s_class, 0) + len(data)
+            self.journal_records[s_class] = records
+            self.journal_bytes[s_class] = size
+            if size > self.max_bytes or (records > self.min_records and
+                                         records > self.ratio * len(objs)):
+                self.dump(s_class, objs)
+
+
+class WriteBehindStorage():
+    """ Buffer changes in memory and commit them to another storage
+    from a background thread, many requests per commit
+    """
+
+    def __init__(self, storage: FileStorage, interval: float = 1.0,
+                 max_dirty: int = 1000):
+        """ Initialize the write-behind storage
+        - storage: the storage changes are committed to
+        - interval: seconds between two background flushes
+        - max_dirty: flush early once this many changes are pending
+        """
+        self.storage = storage
+        self.interval = interval
+        self.max_dirty = max_dirty
+        self.pending = {}
+        self.dirty = 0
+        self.lock = threading.RLock()
+        self.flush_lock = threading.RLock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    @property
+    def lazy(self) -> bool:
+        """ Whether the storage loads snapshot files lazily
+        """
+        return self.storage.lazy
+
+    def file_path(self, s_class: str) -> str:
+        """ Path of the snapshot file of a class
+        """
+        return self.storage.file_path(s_class)
+
+    def load(self, s_class: str) -> Dict[str, dict]:
+        """ Write pending changes, then load from the storage
+        """
+        self.flush()
+        return self.storage.load(s_class)
+
+    def dump(self, s_class: str, objs: dict):
+        """ Write all objects of a class, superseding pending changes
+        """
+        with self.flush_lock:
+            with self.lock:
+                changes = self.pending.pop(s_class, (None, {}))[1]
+                self.dirty -= len(changes)
+            self.storage.dump(s_class, objs)
+
+    def commit(self, s_class: str, objs: dict, changes: dict):
+        """ Queue changes for the background thread
+        """
+        with self.lock:
+            pending = self.pending.setdefault(s_class, (objs, {}))[1]
+            self.dirty += len(changes.keys() - pending.keys())
+            pending.update(changes)
+            if self.dirty >= self.max_dirty:
+                self.wakeup.set()
+            if self.thread is None:
+                self.start()
+
+    def flush(self):
+        """ Commit every pending change to the storage
+        """
+        with self.flush_lock:
+            with self.lock:
+                pending = self.pending
+                self.pending = {}
+                self.dirty = 0
+            for s_class, (objs, changes) in pending.items():
+                try:
+                    self.storage.commit(s_class, objs, changes)
+                except Exception:
+                    self.requeue(s_class, objs, changes)
+                    raise
+            self.storage.flush()
+
+    def requeue(self, s_class: str, objs: dict, changes: dict):
+        """ Put back changes that failed to commit, unless they
+        have been superseded in the meantime
+        """
+        with self.lock:
+            pending = self.pending.setdefault(s_class, (objs, {}))[1]
+            for obj_id, obj in changes.items():
+                if obj_id not in pending:
+                    pending[obj_id] = obj
+                    self.dirty += 1
+
+    def start(self):
+        """ Start the background thread
+        """
+        self.thread = threading.Thread(target=self.run, daemon=True,
+                                       name='storage-write-behind')
+        self.thread.start()
+
+    def install_hooks(self):
+        """ Flush pending changes at exit and on SIGTERM, the latter
+        only when called from the main thread. The previous SIGTERM
+        disposition still applies after the flush: a Python handler
+        is called, the default one terminates the process, and an
+        ignored signal (or a handler not set from Python) is left at that
+        """
+        atexit.register(self.flush)
+        if threading.current_thread() is threading.main_thread():
+            previous = signal.getsignal(signal.SIGTERM)
+
+            def on_sigterm(signum, frame):
+                self.flush()
+                if callable(previous):
+                    previous(signum, frame)
+                elif previous == signal.SIG_DFL:
+                    signal.signal(signum, signal.SIG_DFL)
+                    os.kill(os.getpid(), signum)
+
+            signal.signal(signal.SIGTERM, on_sigterm)
+
+    def run(self):
+        """ Flush on every interval, or earlier when woken up
+        """
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+
+def get_storage() -> FileStorage:
+    """ Build the storage backend selected by STORAGE_TYPE,
+    buffered by a write-behind thread if STORAGE_WRITE_BEHIND=1
+    """
+    lazy = getenv('STORAGE_LAZY_LOAD', '0') == '1'
+    storage = FileStorage(lazy)
+    if getenv('STORAGE_TYPE') == 'journal':
+        storage = JournalStorage(
+            lazy=lazy,
+            max_bytes=int(getenv('STORAGE_JOURNAL_MAX_BYTES',
+                                 4 * 1024 * 1024)),
+            ratio=float(getenv('STORAGE_JOURNAL_RATIO', 1.0)),
+            min_records=int(getenv('STORAGE_JOURNAL_MIN_RECORDS', 1000)),
+            fsync=getenv('STORAGE_FSYNC', '0') == '1'
+        )
+
+    if getenv('STORAGE_WRITE_BEHIND', '0') == '1':
+        storage = WriteBehindStorage(
+            storage,
+            interval=float(getenv('STORAGE_FLUSH_INTERVAL', 1.0)),
+            max_dirty=int(getenv('STORAGE_FLUSH_MAX_DIRTY', 1000))
+        )
+        storage.install_hooks()
+
+    return storage
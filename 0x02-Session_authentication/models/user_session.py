@@ -3,16 +3,22 @@
 Module for for session model
 """
 from models.base import Base
+import sys
 
 
 class UserSession(Base):
     """
     Implement persistent session
     """
+    __slots__ = ('user_id', 'session_id')
+    indexed_attributes = ('session_id',)
+
     def __init__(self, *args: list, **kwargs: dict):
         """
         Initialization method
         """
         super().__init__(*args, **kwargs)
         self.user_id = kwargs.get('user_id')
+        if type(self.user_id) is str:
+            self.user_id = sys.intern(self.user_id)
         self.session_id = kwargs.get('session_id')
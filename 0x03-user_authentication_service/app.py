@@ -3,6 +3,7 @@
 Application module
 """
 from auth import Auth
+from hashing import HashingPoolSaturated
 from flask import (
     Flask,
     jsonify,
@@ -16,6 +17,24 @@ app = Flask(__name__)
 AUTH = Auth()
 
 
+@app.teardown_appcontext
+def close_session(exception: Exception = None) -> None:
+    """
+    Release the database session of the request
+    """
+    AUTH.close()
+
+
+@app.errorhandler(HashingPoolSaturated)
+def hashing_pool_saturated(error: HashingPoolSaturated) -> str:
+    """
+    Reject requests while every password hashing slot is taken
+    """
+    return jsonify({'message': 'service unavailable'}), 503, {
+        'Retry-After': '1'
+    }
+
+
 @app.route('/', methods=['GET'])
 def index() -> str:
     """
@@ -54,13 +73,15 @@ def login() -> str:
         email = request.form['email']
         password = request.form['password']
 
-        if AUTH.valid_login(email, password):
-            session_id = AUTH.create_session(email)
+        session_id = AUTH.login(email, password)
+        if session_id is not None:
             resp = jsonify({'email': email, 'message': 'logged in'})
             resp.set_cookie('session_id', session_id)
 
             return resp
         abort(401)
+    except HashingPoolSaturated:
+        raise
     except Exception:
         abort(401)
 
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Application module, asyncio variant served by an ASGI server:
+    hypercorn --keep-alive 75 --bind 127.0.0.1:5000 async_app:app
+Idle keep-alive connections cost a coroutine each, not a thread
+"""
+from async_auth import AsyncAuth
+from hashing import HashingPoolSaturated
+from quart import (
+    Quart,
+    jsonify,
+    request,
+    abort,
+    redirect,
+    url_for
+)
+
+app = Quart(__name__)
+AUTH = AsyncAuth()
+
+
+@app.errorhandler(HashingPoolSaturated)
+async def hashing_pool_saturated(error: HashingPoolSaturated) -> str:
+    """
+    Reject requests while every password hashing slot is taken
+    """
+    return jsonify({'message': 'service unavailable'}), 503, {
+        'Retry-After': '1'
+    }
+
+
+@app.route('/', methods=['GET'])
+async def index() -> str:
+    """
+    Get the index
+    """
+    return jsonify({"message": "Bienvenue"})
+
+
+@app.route('/users', methods=['POST'])
+async def users() -> str:
+    """
+    Register users
+    """
+    form = await request.form
+    email = form.get('email')
+    password = form.get('password')
+
+    try:
+        user = await AUTH.register_user(email, password)
+
+        return jsonify({
+            'email': user.email,
+            'message': 'user created'
+        })
+    except ValueError:
+        return jsonify({
+            'message': 'email already registered'
+        }), 400
+
+
+@app.route('/sessions', methods=['POST'])
+async def login() -> str:
+    """
+    Create a new session and log a user in
+    """
+    try:
+        form = await request.form
+        email = form['email']
+        password = form['password']
+
+        session_id = await AUTH.login(email, password)
+        if session_id is not None:
+            resp = jsonify({'email': email, 'message': 'logged in'})
+            resp.set_cookie('session_id', session_id)
+
+            return resp
+        abort(401)
+    except HashingPoolSaturated:
+        raise
+    except Exception:
+        abort(401)
+
+
+@app.route('/sessions', methods=['DELETE'])
+async def logout() -> str:
+    """
+    Log out a given user and delete the user session
+    """
+    session_id = request.cookies.get('session_id')
+    user = await AUTH.get_user_from_session_id(session_id)
+    if user:
+        await AUTH.destroy_session(user.id)
+        return redirect(url_for('index'))
+
+    abort(403)
+
+
+@app.route('/profile', methods=['GET'])
+async def profile() -> str:
+    """
+    Get the user profile
+    """
+    session_id = request.cookies.get('session_id')
+    user = await AUTH.get_user_from_session_id(session_id)
+    if user:
+        return jsonify({'email': user.email})
+
+    abort(403)
+
+
+@app.route('/reset_password', methods=['POST'])
+async def get_reset_password_token() -> str:
+    """
+    Generate reset token for the user
+    """
+    try:
+        form = await request.form
+        email = form.get('email')
+        token = await AUTH.get_reset_password_token(email)
+
+        return jsonify(
+            {'email': email, 'reset_token': token}
+        )
+    except ValueError:
+        abort(403)
+
+
+@app.route('/reset_password', methods=['PUT'])
+async def update_password() -> str:
+    """
+    Update password
+    """
+    try:
+        form = await request.form
+        email = form['email']
+        reset_token = form['reset_token']
+        new_password = form['new_password']
+
+        await AUTH.update_password(reset_token, new_password)
+        return jsonify({
+            'email': email,
+            'message': "Password updated"
+        })
+    except ValueError:
+        abort(403)
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000)
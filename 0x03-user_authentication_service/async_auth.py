@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Module for asyncio Authentication
+"""
+import asyncio
+import bcrypt
+import typing as t
+
+from async_db import AsyncDB
+from auth import Auth
+from db import DB
+from hashing import HASHING_POOL, HashingPoolSaturated, PASSWORD_POLICY
+from user import User
+
+
+async def _hashing(fn: t.Callable, *args) -> t.Any:
+    """
+    Await fn(*args) run on the hashing pool
+    """
+    return await asyncio.wrap_future(HASHING_POOL.submit(fn, *args))
+
+
+async def _hash_password(password: str) -> bytes:
+    """
+    Hash a given password
+    """
+    return await _hashing(
+        bcrypt.hashpw,
+        password.encode('utf-8'),
+        PASSWORD_POLICY.gensalt()
+    )
+
+
+class AsyncAuth:
+    """
+    Auth with awaitable methods. The database steps are the ones of
+    Auth, run on the database thread pool; bcrypt is awaited on the
+    hashing pool in between, so no database thread waits for a hash,
+    and cached sessions are answered on the event loop
+    """
+    def __init__(self) -> None:
+        """
+        Initialization method
+        """
+        db = DB()
+        self._auth = Auth(db)
+        self._db = AsyncDB(db)
+
+    async def register_user(self, email: str, password: str) -> User:
+        """
+        Create and register a new user
+        """
+        hashed_password = await _hash_password(password)
+
+        return await self._db.run(self._auth._add_user, email, hashed_password)
+
+    async def valid_login(self, email: str, password: str) -> bool:
+        """
+        Validate login
+        """
+        try:
+            user = await self._db.find_user_by(email=email)
+            if not await self._check_password(user, password):
+                return False
+
+            self._auth._schedule_rehash(user, password, user.version)
+
+            return True
+        except HashingPoolSaturated:
+            raise
+        except Exception:
+            return False
+
+    async def login(self, email: str, password: str) -> t.Optional[str]:
+        """
+        Validate login and create a new session at once
+        Return the session id, None if the credentials are wrong
+        """
+        try:
+            user = await self._db.find_user_by(email=email)
+            if not await self._check_password(user, password):
+                return None
+
+            return await self._db.run(self._auth._open_session, user, password)
+        except HashingPoolSaturated:
+            raise
+        except Exception:
+            return None
+
+    async def _check_password(self, user: User, password: str) -> bool:
+        """
+        Check a password against the hash of a user
+        """
+        return await _hashing(
+            bcrypt.checkpw,
+            password.encode('utf-8'),
+            user.hashed_password
+        )
+
+    async def create_session(self, email: str) -> str:
+        """
+        Create a new user session
+        """
+        return await self._db.run(self._auth.create_session, email)
+
+    async def get_user_from_session_id(
+        self,
+        session_id: str
+    ) -> t.Optional[User]:
+        """
+        Get a user using the given session id
+        A cached session gives a User holding only its id and email
+        """
+        if session_id is None:
+            return None
+
+        user = self._auth._cached_user(session_id)
+        if user is not None:
+            return user
+
+        return await self._db.run(self._auth._load_session_user, session_id)
+
+    async def destroy_session(self, user_id: int) -> None:
+        """
+        Destroy the session id of the user whose id is given
+        """
+        await self._db.run(self._auth.destroy_session, user_id)
+
+    async def get_reset_password_token(self, email: str) -> str:
+        """
+        Generate a reset password token
+        """
+        return await self._db.run(self._auth.get_reset_password_token, email)
+
+    async def update_password(self, reset_token: str, password: str) -> None:
+        """
+        Update user password
+        """
+        try:
+            user = await self._db.find_user_by(reset_token=reset_token)
+            hashed_password = await _hash_password(password)
+            await self._db.run(self._auth._set_password, user, hashed_password)
+        except HashingPoolSaturated:
+            raise
+        except Exception:
+            raise ValueError
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Module for the asyncio Database Implementation
+"""
+from concurrent.futures import ThreadPoolExecutor
+from os import getenv
+import asyncio
+import functools
+import typing as t
+
+from db import DB
+from user import User
+
+
+class AsyncDB:
+    """
+    Awaitable DB: every call runs on a thread pool as big as the
+    connection pool, in a session released when the call returns.
+    Users are returned detached, with their columns loaded
+    """
+    def __init__(self, db: DB = None, workers: int = None) -> None:
+        """
+        Initialization method
+        """
+        self._db = db or DB()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or int(getenv('DB_POOL_SIZE', 5)),
+            thread_name_prefix='db'
+        )
+
+    async def run(self, fn: t.Callable, *args, **kwargs) -> t.Any:
+        """
+        Await fn(*args, **kwargs) run on the pool, fn using this DB
+        """
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(self._call, fn, *args, **kwargs)
+        )
+
+    def _call(self, fn: t.Callable, *args, **kwargs) -> t.Any:
+        """
+        Call fn in a session of its own, loading the columns of the
+        user it returns before the session is closed
+        """
+        try:
+            result = fn(*args, **kwargs)
+            if isinstance(result, User):
+                for column in User.__table__.columns:
+                    getattr(result, column.key)
+
+            return result
+        finally:
+            self._db.close()
+
+    async def add_user(self, email: str, hashed_password: str) -> User:
+        """
+        Add a user to users table in the database
+        """
+        return await self.run(self._db.add_user, email, hashed_password)
+
+    async def add_users(self, rows: t.Iterable, **kwargs) -> t.Dict[str, int]:
+        """
+        Bulk add (email, hashed password) rows, see DB.add_users
+        """
+        return await self.run(self._db.add_users, rows, **kwargs)
+
+    async def find_user_by(self, **kwargs) -> User:
+        """
+        Get a user using attributes
+        """
+        return await self.run(self._db.find_user_by, **kwargs)
+
+    async def update_user(
+        self,
+        user_id: int,
+        expected_version: int = None,
+        **kwargs
+    ) -> None:
+        """
+        Update given columns of a user, see DB.update_user
+        """
+        await self.run(
+            self._db.update_user,
+            user_id,
+            expected_version,
+            **kwargs
+        )
@@ -4,9 +4,17 @@ Module for Authentication
 """
 import uuid
 import bcrypt
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from os import getenv
+import os
 from db import DB
+from hashing import HASHING_POOL, HashingPoolSaturated, PASSWORD_POLICY
 from user import User
-from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.exc import IntegrityError
 import typing as t
 
 
@@ -14,7 +22,10 @@ def _hash_password(password: str) -> bytes:
     """
     Hash a given password
     """
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    return HASHING_POOL.hashpw(
+        password.encode('utf-8'),
+        PASSWORD_POLICY.gensalt()
+    )
 
 
 def _generate_uuid() -> str:
@@ -24,28 +35,210 @@ def _generate_uuid() -> str:
     return str(uuid.uuid4())
 
 
+class SessionCache:
+    """
+    Bounded LRU cache of session id -> (user id, email), with hit and
+    miss counters. Entries live at most ttl seconds, which bounds how
+    long another process may serve a session destroyed elsewhere:
+    a logout is seen by the other workers after at most ttl seconds
+    """
+    def __init__(self, maxsize: int = 10000, ttl: float = 5) -> None:
+        """
+        Initialization method
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._clock = 0
+        self._changed = OrderedDict()
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def token(self) -> int:
+        """
+        Token to take before reading a session from the database, and
+        to give to set() when caching what was read
+        """
+        with self._lock:
+            return self._clock
+
+    def get(self, session_id: str) -> t.Optional[t.Tuple[int, str]]:
+        """
+        Get (user id, email) of a session, None if not cached
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    self._discard(session_id)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def set(
+        self,
+        session_id: str,
+        user_id: int,
+        email: str,
+        token: int = None
+    ) -> None:
+        """
+        Cache the session of a user, replacing its previous one
+        - token: from token(), taken before the session was read; the
+          session isn't cached if the user changed since then
+        """
+        with self._lock:
+            if token is not None and (
+                token < self._floor or
+                self._changed.get(user_id, -1) >= token
+            ):
+                return
+
+            self._discard(self._by_user.get(user_id))
+            self._entries[session_id] = (
+                user_id,
+                email,
+                time.monotonic() + self.ttl
+            )
+            self._by_user[user_id] = session_id
+            self._touch(user_id)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        """
+        Drop the cached session of a user, to call after each write
+        of its session or password
+        """
+        with self._lock:
+            self._discard(self._by_user.get(user_id))
+            self._touch(user_id)
+
+    def _touch(self, user_id: int) -> None:
+        """
+        Record a change of a user, the lock being held. Only the
+        latest maxsize changes are kept, older tokens are refused
+        """
+        self._clock += 1
+        self._changed[user_id] = self._clock
+        self._changed.move_to_end(user_id)
+        while len(self._changed) > self.maxsize:
+            self._floor = self._changed.popitem(last=False)[1] + 1
+
+    def _discard(self, session_id: str) -> None:
+        """
+        Drop a session, the lock being held
+        """
+        entry = self._entries.pop(session_id, None)
+        if entry is not None and self._by_user.get(entry[0]) == session_id:
+            del self._by_user[entry[0]]
+
+
 class Auth:
     """Auth class to interact with the authentication database.
     """
-    def __init__(self):
-        self._db = DB()
+    def __init__(self, db: DB = None):
+        self._db = db or DB()
+        self._sessions = SessionCache(
+            int(getenv('SESSION_CACHE_SIZE', 10000)),
+            float(getenv('SESSION_CACHE_TTL', 5))
+        )
+
+    def close(self) -> None:
+        """
+        Release the database session of the current thread
+        """
+        self._db.close()
 
     def register_user(self, email: str, password: str) -> User:
         """
         Create and register a new user
         """
-        try:
-            user = self._db.find_user_by(email=email)
+        return self._add_user(email, _hash_password(password))
 
-            raise ValueError(f"User {email} already exists")
-        except NoResultFound:
-            hashed_password = _hash_password(password)
+    def _add_user(self, email: str, hashed_password: bytes) -> User:
+        """
+        Store a new user, the database step of register_user
+        """
+        try:
             user = self._db.add_user(
                 email=email,
                 hashed_password=hashed_password
             )
 
             return user
+        except IntegrityError:
+            raise ValueError(f"User {email} already exists")
+
+    def import_users(
+        self,
+        rows: t.Iterable[t.Tuple[str, t.Union[str, bytes]]],
+        plaintext: bool = False,
+        on_duplicate: str = 'error',
+        batch_size: int = 1000,
+        workers: int = None
+    ) -> t.Dict[str, float]:
+        """
+        Bulk register (email, password hash) rows, or (email, password)
+        rows hashed on workers threads if plaintext, in batches
+        - on_duplicate: 'error', 'skip' or 'update', see DB.add_users
+        Return the counts of DB.add_users with the elapsed seconds and
+        the rows per second
+        Plaintext rows are hashed on a pool of their own so an import
+        never takes the hashing pool from logins
+        """
+        start = time.monotonic()
+        rows = (
+            (email, secret.encode('utf-8') if isinstance(secret, str)
+             else secret)
+            for email, secret in rows
+        )
+        if plaintext:
+            executor = ThreadPoolExecutor(
+                max_workers=workers or os.cpu_count() or 1,
+                thread_name_prefix='import'
+            )
+            rows = self._hash_rows(executor, rows, batch_size)
+        try:
+            counts = self._db.add_users(rows, on_duplicate, batch_size)
+        except IntegrityError:
+            raise ValueError("Some users already exist")
+        finally:
+            if plaintext:
+                executor.shutdown()
+        elapsed = time.monotonic() - start
+        total = sum(counts.values())
+        counts['seconds'] = elapsed
+        counts['rows_per_second'] = total / elapsed if elapsed else 0
+
+        return counts
+
+    @staticmethod
+    def _hash_rows(
+        executor: ThreadPoolExecutor,
+        rows: t.Iterator[t.Tuple[str, bytes]],
+        batch_size: int
+    ) -> t.Iterator[t.Tuple[str, bytes]]:
+        """
+        Hash the passwords of rows on executor, one batch at a time
+        """
+        salt = PASSWORD_POLICY.gensalt
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+
+            hashes = executor.map(
+                lambda password: bcrypt.hashpw(password, salt()),
+                [password for _, password in batch]
+            )
+            yield from zip((email for email, _ in batch), hashes)
 
     def valid_login(self, email: str, password: str) -> bool:
         """
@@ -53,34 +246,147 @@ class Auth:
         """
         try:
             user = self._db.find_user_by(email=email)
-            if bcrypt.checkpw(password.encode('utf-8'), user.hashed_password):
-                return True
+            if not self._check_password(user, password):
+                return False
 
-            return False
+            self._schedule_rehash(user, password, user.version)
+
+            return True
+        except HashingPoolSaturated:
+            raise
         except Exception:
             return False
 
+    def login(self, email: str, password: str) -> t.Optional[str]:
+        """
+        Validate login and create a new session at once: one read of
+        the user and one write of its session id
+        Return the session id, None if the credentials are wrong
+        """
+        try:
+            user = self._db.find_user_by(email=email)
+            if not self._check_password(user, password):
+                return None
+
+            return self._open_session(user, password)
+        except HashingPoolSaturated:
+            raise
+        except Exception:
+            return None
+
+    def _check_password(self, user: User, password: str) -> bool:
+        """
+        Check a password against the hash of a user
+        """
+        return HASHING_POOL.checkpw(
+            password.encode('utf-8'),
+            user.hashed_password
+        )
+
+    def _schedule_rehash(
+        self,
+        user: User,
+        password: str,
+        version: int
+    ) -> None:
+        """
+        Rehash a verified password in the background if its hash
+        doesn't follow the policy, skipped if the hashing pool is
+        busy: the next login retries
+        - version: version of the user once the caller's own writes
+          are done, the rehash is dropped if the user changes after
+        """
+        if not PASSWORD_POLICY.needs_rehash(user.hashed_password):
+            return
+
+        try:
+            HASHING_POOL.submit(self._rehash, user.id, password, version)
+        except HashingPoolSaturated:
+            pass
+
+    def _rehash(self, user_id: int, password: str, version: int) -> None:
+        """
+        Store a new hash of the password, unless the user has changed
+        since it was verified
+        """
+        try:
+            new_hashed_password = bcrypt.hashpw(
+                password.encode('utf-8'),
+                PASSWORD_POLICY.gensalt()
+            )
+            self._db.update_user(
+                user_id,
+                expected_version=version,
+                hashed_password=new_hashed_password
+            )
+        except Exception:
+            pass
+        finally:
+            self._db.close()
+
     def create_session(self, email: str) -> str:
         """
         Create a new user session
         """
         try:
             user = self._db.find_user_by(email=email)
-            user.session_id = _generate_uuid()
 
-            return user.session_id
+            return self._open_session(user)
         except Exception:
             return None
 
+    def _open_session(self, user: User, password: str = None) -> str:
+        """
+        Write and cache a new session of a user, the database step of
+        login and create_session. Only the columns of the user are
+        read, it may be detached
+        - password: verified password of a login, rehashed in the
+          background if its hash doesn't follow the policy
+        """
+        version = user.version
+        session_id = _generate_uuid()
+        self._sessions.invalidate_user(user.id)
+        self._db.update_user(user.id, session_id=session_id)
+        self._sessions.set(session_id, user.id, user.email)
+        if password is not None:
+            self._schedule_rehash(user, password, version + 1)
+
+        return session_id
+
     def get_user_from_session_id(self, session_id: str) -> t.Optional[User]:
         """
         Get a user using the given session id
+        A cached session gives a User holding only its id and email
         """
         if session_id is None:
             return None
 
+        user = self._cached_user(session_id)
+        if user is not None:
+            return user
+
+        return self._load_session_user(session_id)
+
+    def _cached_user(self, session_id: str) -> t.Optional[User]:
+        """
+        Get the user of a cached session, holding only its id and
+        email, without touching the database
+        """
+        cached = self._sessions.get(session_id)
+        if cached is not None:
+            return User(id=cached[0], email=cached[1])
+
+        return None
+
+    def _load_session_user(self, session_id: str) -> t.Optional[User]:
+        """
+        Read the user of a session from the database and cache it,
+        the database step of get_user_from_session_id
+        """
+        token = self._sessions.token()
         try:
             user = self._db.find_user_by(session_id=session_id)
+            self._sessions.set(session_id, user.id, user.email, token)
 
             return user
         except Exception:
@@ -90,7 +396,9 @@ class Auth:
         """
         Destroy the session id of the user whose id is gievn
         """
+        self._sessions.invalidate_user(user_id)
         self._db.update_user(user_id, session_id=None)
+        self._sessions.invalidate_user(user_id)
 
     def get_reset_password_token(self, email: str) -> str:
         """
@@ -111,15 +419,21 @@ class Auth:
         """
         try:
             user = self._db.find_user_by(reset_token=reset_token)
-            hashed_pwd = bcrypt.hashpw(
-                password.encode('utf-8'),
-                bcrypt.gensalt()
-            )
-
-            self._db.update_user(
-                user.id,
-                hashed_password=hashed_pwd,
-                reset_token=None
-            )
+            self._set_password(user, _hash_password(password))
+        except HashingPoolSaturated:
+            raise
         except Exception:
             raise ValueError
+
+    def _set_password(self, user: User, hashed_password: bytes) -> None:
+        """
+        Store the new hash of a user read by its reset token, unless
+        the user changed since, the database step of update_password
+        """
+        self._sessions.invalidate_user(user.id)
+        self._db.update_user(
+            user.id,
+            expected_version=user.version,
+            hashed_password=hashed_password,
+            reset_token=None
+        )
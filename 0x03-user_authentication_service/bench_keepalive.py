@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark: GET /profile throughput while idle keep-alive connections
+are held open, to compare app.py with async_app.py
+Usage: ./bench_keepalive.py [URL] [idle connections] [active clients]
+(default http://127.0.0.1:5000 1000 8)
+"""
+from urllib.parse import urlsplit
+import asyncio
+import sys
+import time
+import uuid
+import requests
+DURATION = 5
+
+
+def log_in(url: str) -> str:
+    """
+    Register a new user and return its session id
+    """
+    email = "{}@bench.test".format(uuid.uuid4())
+    payload = {'email': email, 'password': 'bench'}
+    requests.post(f"{url}/users", data=payload)
+    resp = requests.post(f"{url}/sessions", data=payload)
+    assert resp.status_code == 200
+
+    return resp.cookies.get('session_id')
+
+
+class Connection:
+    """
+    HTTP/1.1 keep-alive connection sending GET /profile
+    """
+    def __init__(self, host: str, port: int, session_id: str) -> None:
+        """
+        Initialization method
+        """
+        self.host = host
+        self.port = port
+        self.request = (
+            f"GET /profile HTTP/1.1\r\nHost: {host}\r\n"
+            f"Cookie: session_id={session_id}\r\n\r\n"
+        ).encode()
+        self.reconnects = 0
+        self.writer = None
+
+    async def open(self) -> None:
+        """
+        Open the connection
+        """
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host,
+            self.port
+        )
+
+    async def get(self) -> int:
+        """
+        Send the request and return the status of the response,
+        reconnecting first if the server closed the connection
+        """
+        if self.writer is None:
+            await self.open()
+            self.reconnects += 1
+        self.writer.write(self.request)
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        keep_alive = True
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.partition(b':')
+            name = name.strip().lower()
+            if name == b'content-length':
+                length = int(value)
+            elif name == b'connection':
+                keep_alive = value.strip().lower() != b'close'
+        await self.reader.readexactly(length)
+        if not keep_alive:
+            self.close()
+
+        return status
+
+    def close(self) -> None:
+        """
+        Close the connection
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+async def hold(connection: Connection, ready: asyncio.Queue) -> None:
+    """
+    Make one request on a connection left open and idle, report
+    whether the server still holds it
+    """
+    try:
+        await connection.open()
+        await ready.put(
+            await connection.get() == 200 and connection.writer is not None
+        )
+    except Exception:
+        await ready.put(False)
+
+
+async def hammer(connection: Connection, deadline: float) -> int:
+    """
+    Request the profile until deadline, return the number of requests
+    """
+    count = 0
+    await connection.open()
+    while time.monotonic() < deadline:
+        assert await connection.get() == 200
+        count += 1
+    connection.close()
+
+    return count
+
+
+async def bench(url: str, idle: int, active: int) -> None:
+    """
+    Hold idle connections open, then measure active clients
+    """
+    parts = urlsplit(url)
+    session_id = log_in(url)
+    idle_connections = [
+        Connection(parts.hostname, parts.port or 80, session_id)
+        for _ in range(idle)
+    ]
+    ready = asyncio.Queue()
+    start = time.monotonic()
+    for connection in idle_connections:
+        asyncio.ensure_future(hold(connection, ready))
+    held = sum([await ready.get() for _ in range(idle)])
+    print(f"{held}/{idle} idle keep-alive connections held "
+          f"after {time.monotonic() - start:.2f}s")
+
+    deadline = time.monotonic() + DURATION
+    active_connections = [
+        Connection(parts.hostname, parts.port or 80, session_id)
+        for _ in range(active)
+    ]
+    counts = await asyncio.gather(*[
+        hammer(connection, deadline) for connection in active_connections
+    ], return_exceptions=True)
+    failed = sum(1 for count in counts if isinstance(count, Exception))
+    total = sum(count for count in counts if isinstance(count, int))
+    reconnects = sum(c.reconnects for c in active_connections)
+    print(f"{active} active clients: {total / DURATION:.0f} req/s, "
+          f"{reconnects} reconnects, {failed} failed")
+    for connection in idle_connections:
+        connection.close()
+
+
+if __name__ == '__main__':
+    url = sys.argv[1] if len(sys.argv) > 1 else 'http://127.0.0.1:5000'
+    idle = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    active = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    asyncio.get_event_loop().run_until_complete(bench(url, idle, active))
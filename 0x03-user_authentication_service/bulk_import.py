@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Bulk import of users from a CSV or JSONL file
+Usage: ./bulk_import.py FILE [error|skip|update]
+Rows hold an email and either a hashed_password, stored as is, or a
+password, hashed on BULK_WORKERS threads (default: CPU count)
+Rows are written BULK_BATCH_SIZE at a time (default 1000)
+"""
+from os import getenv
+import csv
+import json
+import sys
+import typing as t
+
+from auth import Auth
+
+
+def read_rows(path: str) -> t.Tuple[bool, t.Iterator[t.Tuple[str, str]]]:
+    """
+    Return whether the rows of a CSV (with a header) or JSONL file
+    hold plaintext passwords, and an iterator over its rows
+    """
+    file = open(path, newline='')
+    if path.endswith('.jsonl'):
+        records = (json.loads(line) for line in file if line.strip())
+    else:
+        records = csv.DictReader(file)
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        file.close()
+        return False, iter(())
+
+    key = 'hashed_password' if 'hashed_password' in first else 'password'
+
+    def rows() -> t.Iterator[t.Tuple[str, str]]:
+        """
+        Yield the (email, password or hash) rows and close the file
+        """
+        with file:
+            yield first['email'], first[key]
+            for record in records:
+                yield record['email'], record[key]
+
+    return key == 'password', rows()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit(__doc__.strip().split('\n')[1])
+
+    plaintext, rows = read_rows(sys.argv[1])
+    workers = getenv('BULK_WORKERS')
+    report = Auth().import_users(
+        rows,
+        plaintext=plaintext,
+        on_duplicate=sys.argv[2] if len(sys.argv) > 2 else 'error',
+        batch_size=int(getenv('BULK_BATCH_SIZE', 1000)),
+        workers=int(workers) if workers else None
+    )
+    print("{inserted} inserted, {updated} updated, {skipped} skipped "
+          "in {seconds:.2f}s ({rows_per_second:.0f} rows/s)".format(**report))
@@ -2,37 +2,104 @@
 """
 Module for Database Implementation
 """
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, inspect, select, text
 # from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.orm.session import Session
-from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm.exc import NoResultFound, StaleDataError
+from sqlalchemy.exc import InvalidRequestError, IntegrityError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.schema import CreateColumn
+from itertools import islice
+from os import getenv
 import typing as t
 
 from user import Base
 from user import User
 
+DUPLICATE_MODES = ('error', 'skip', 'update')
+UPDATABLE_COLUMNS = frozenset(
+    User.__table__.columns.keys()
+) - {'id', 'version'}
+
 
 class DB:
     """DB class
     """
-    def __init__(self) -> None:
+    def __init__(self, reset: bool = None) -> None:
         """Initialize a new DB instance
+        - reset: drop and recreate every table, defaults to
+          AUTH_DB_RESET=1; otherwise the existing schema is migrated
         """
-        self._engine = create_engine("sqlite:///a.db")
-        Base.metadata.drop_all(self._engine)
+        url = getenv('AUTH_DB_URL', "sqlite:///a.db")
+        if reset is None:
+            reset = getenv('AUTH_DB_RESET', '0') == '1'
+        connect_args = {}
+        if url.startswith('sqlite'):
+            connect_args['check_same_thread'] = False
+        self._engine = create_engine(
+            url,
+            poolclass=QueuePool,
+            pool_size=int(getenv('DB_POOL_SIZE', 5)),
+            max_overflow=int(getenv('DB_POOL_MAX_OVERFLOW', 10)),
+            pool_timeout=float(getenv('DB_POOL_TIMEOUT', 30)),
+            connect_args=connect_args
+        )
+        if reset:
+            Base.metadata.drop_all(self._engine)
         Base.metadata.create_all(self._engine)
-        self.__session = None
+        self.migrate()
+        self.__session = scoped_session(
+            sessionmaker(bind=self._engine, expire_on_commit=False)
+        )
+
+    def migrate(self) -> None:
+        """
+        Bring an existing users table up to the model: add the
+        columns and create the indexes it lacks. Only reads the
+        schema, whatever the number of rows, when nothing is missing.
+        Raise ValueError if a missing column can't be added, and
+        IntegrityError if the table holds duplicate emails
+        """
+        table = User.__table__
+        inspector = inspect(self._engine)
+        columns = {
+            column['name'] for column in inspector.get_columns(table.name)
+        }
+        with self._engine.begin() as connection:
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    raise ValueError(
+                        f"Can't add column {table.name}.{column.name}"
+                    )
+                ddl = CreateColumn(column).compile(
+                    dialect=self._engine.dialect
+                )
+                connection.execute(
+                    text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                )
+
+        indexes = {
+            index['name'] for index in inspector.get_indexes(table.name)
+        }
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(bind=self._engine)
 
     @property
     def _session(self) -> Session:
-        """Memoized session object
+        """Session of the current thread
         """
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        return self.__session()
+
+    def close(self) -> None:
+        """
+        Close the session of the current thread and give its
+        connection back to the pool
+        """
+        self.__session.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """
@@ -40,10 +107,68 @@ class DB:
         """
         user = User(email=email, hashed_password=hashed_password)
         self._session.add(user)
-        self._session.commit()
+        try:
+            self._session.commit()
+        except IntegrityError:
+            self._session.rollback()
+            raise
 
         return user
 
+    def add_users(
+        self,
+        rows: t.Iterable[t.Tuple[str, t.Union[str, bytes]]],
+        on_duplicate: str = 'error',
+        batch_size: int = 1000
+    ) -> t.Dict[str, int]:
+        """
+        Add (email, hashed password) rows in one transaction and one
+        executemany per batch of batch_size rows
+        - on_duplicate: for an email already stored, 'error' raises
+          IntegrityError and rolls back the current batch, 'skip'
+          keeps the stored user and 'update' replaces its password
+        Within a batch the last row of an email wins
+        Return the number of rows inserted, updated and skipped
+        """
+        if on_duplicate not in DUPLICATE_MODES:
+            raise ValueError(on_duplicate)
+
+        table = User.__table__
+        update = table.update().where(
+            table.c.email == bindparam('b_email')
+        ).values(hashed_password=bindparam('b_hashed_password'))
+        counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        rows = iter(rows)
+        while True:
+            batch = dict(islice(rows, batch_size))
+            if not batch:
+                return counts
+
+            with self._engine.begin() as connection:
+                existing = set()
+                if on_duplicate != 'error':
+                    existing = {row[0] for row in connection.execute(
+                        select([table.c.email]).where(
+                            table.c.email.in_(list(batch))
+                        )
+                    )}
+                new = [
+                    {'email': email, 'hashed_password': hashed_password}
+                    for email, hashed_password in batch.items()
+                    if email not in existing
+                ]
+                if new:
+                    connection.execute(table.insert(), new)
+                if existing and on_duplicate == 'update':
+                    connection.execute(update, [
+                        {'b_email': email, 'b_hashed_password': batch[email]}
+                        for email in existing
+                    ])
+                    counts['updated'] += len(existing)
+                else:
+                    counts['skipped'] += len(existing)
+                counts['inserted'] += len(new)
+
     def find_user_by(self, **kwargs) -> User:
         """
         Get a user using attributes
@@ -57,16 +182,38 @@ class DB:
         except Exception:
             raise InvalidRequestError
 
-    def update_user(self, user_id: int, **kwargs) -> None:
+    def update_user(
+        self,
+        user_id: int,
+        expected_version: int = None,
+        **kwargs
+    ) -> None:
         """
-        Update a given user
+        Update given columns of a user in a single UPDATE statement,
+        which also increments its version
+        - expected_version: only update the user if it still has this
+          version, else raise StaleDataError
+        Raise NoResultFound if there is no such user
         """
-        user = self.find_user_by(id=user_id)
-        for key, value in kwargs.items():
-            if key not in User.__table__.columns.keys():
+        for key in kwargs:
+            if key not in UPDATABLE_COLUMNS:
                 raise ValueError
 
-            setattr(user, key, value)
+        query = self._session.query(User).filter(User.id == user_id)
+        if expected_version is not None:
+            query = query.filter(User.version == expected_version)
+        kwargs['version'] = User.version + 1
+        try:
+            count = query.update(kwargs, synchronize_session='evaluate')
+            self._session.commit()
+        except Exception:
+            self._session.rollback()
+            raise
 
-        self._session.add(user)
-        self._session.commit()
+        if count == 0:
+            if expected_version is not None:
+                raise StaleDataError(
+                    f"User {user_id} is missing or changed since "
+                    f"version {expected_version}"
+                )
+            raise NoResultFound
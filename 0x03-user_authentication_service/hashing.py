@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Module for Password Hashing off the request thread
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from os import getenv
+import math
+import os
+import threading
+import time
+import typing as t
+import bcrypt
+
+
+class HashingPoolSaturated(Exception):
+    """Raised when the hashing pool can't take more work
+    """
+
+
+class HashingPool:
+    """
+    Bounded pool of threads running bcrypt, which releases the GIL
+    while hashing. At most size calls run and queue_size wait, any
+    call beyond that is rejected at once with HashingPoolSaturated
+    """
+    def __init__(self, size: int, queue_size: int) -> None:
+        """
+        Initialization method
+        """
+        self.size = size
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=size,
+            thread_name_prefix='bcrypt'
+        )
+        self._slots = threading.BoundedSemaphore(size + queue_size)
+
+    def submit(self, fn: t.Callable, *args) -> Future:
+        """
+        Run fn(*args) on the pool
+        """
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolSaturated
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        return future
+
+    def hashpw(self, password: bytes, salt: bytes) -> bytes:
+        """
+        bcrypt.hashpw on the pool
+        """
+        return self.submit(bcrypt.hashpw, password, salt).result()
+
+    def checkpw(self, password: bytes, hashed_password: bytes) -> bool:
+        """
+        bcrypt.checkpw on the pool
+        """
+        return self.submit(bcrypt.checkpw, password, hashed_password).result()
+
+
+class PasswordPolicy:
+    """
+    bcrypt work factor (log2 of the number of rounds) of new hashes
+    """
+    def __init__(self, rounds: int = 12) -> None:
+        """
+        Initialization method
+        """
+        self.rounds = rounds
+
+    def gensalt(self) -> bytes:
+        """
+        Generate a salt with the policy work factor
+        """
+        return bcrypt.gensalt(rounds=self.rounds)
+
+    @staticmethod
+    def rounds_of(hashed_password: t.Union[bytes, str]) -> int:
+        """
+        Get the work factor of a hash, '$2b$<rounds>$<salt+hash>'
+        """
+        if isinstance(hashed_password, str):
+            hashed_password = hashed_password.encode('utf-8')
+
+        return int(hashed_password.split(b'$')[2])
+
+    def needs_rehash(self, hashed_password: t.Union[bytes, str]) -> bool:
+        """
+        Check if a hash was made with another work factor
+        """
+        try:
+            return self.rounds_of(hashed_password) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    @classmethod
+    def calibrate(cls, target_ms: float, min_rounds: int = 4,
+                  max_rounds: int = 16) -> 'PasswordPolicy':
+        """
+        Get the policy with the highest work factor whose checkpw
+        stays within target_ms on this machine; each extra round
+        doubles the cost
+        """
+        def verify_ms(rounds: int) -> float:
+            hashed = bcrypt.hashpw(b'calibration', bcrypt.gensalt(rounds))
+            start = time.perf_counter()
+            bcrypt.checkpw(b'calibration', hashed)
+            return (time.perf_counter() - start) * 1000
+
+        base_ms = max(verify_ms(min_rounds), 1e-3)
+        rounds = min_rounds + int(math.log2(max(target_ms / base_ms, 1)))
+        rounds = min(max(rounds, min_rounds), max_rounds)
+        while rounds > min_rounds and verify_ms(rounds) > target_ms:
+            rounds -= 1
+
+        return cls(rounds)
+
+
+if getenv('BCRYPT_TARGET_MS') is not None:
+    PASSWORD_POLICY = PasswordPolicy.calibrate(
+        float(getenv('BCRYPT_TARGET_MS'))
+    )
+else:
+    PASSWORD_POLICY = PasswordPolicy(int(getenv('BCRYPT_ROUNDS', 12)))
+HASHING_POOL = HashingPool(
+    int(getenv('HASH_POOL_SIZE', os.cpu_count() or 1)),
+    int(getenv('HASH_POOL_QUEUE_SIZE', 32))
+)
+
+
+if __name__ == '__main__':
+    import sys
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 250
+    policy = PasswordPolicy.calibrate(target_ms)
+    print(f"BCRYPT_ROUNDS={policy.rounds} for checkpw <= {target_ms}ms")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Load test: throughput of GET /profile for several client thread counts
+Usage: ./load_test.py [threads ...] (default 1 2 4 8), server on URL
+"""
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import time
+import uuid
+import requests
+URL = 'http://127.0.0.1:5000'
+DURATION = 5
+
+
+def log_in() -> str:
+    """
+    Register a new user and return its session id
+    """
+    email = "{}@load.test".format(uuid.uuid4())
+    payload = {'email': email, 'password': 'load'}
+    requests.post(f"{URL}/users", data=payload)
+    resp = requests.post(f"{URL}/sessions", data=payload)
+    assert resp.status_code == 200
+
+    return resp.cookies.get('session_id')
+
+
+def hammer(session_id: str, deadline: float) -> int:
+    """
+    Request the profile until deadline, return the number of requests
+    """
+    count = 0
+    with requests.Session() as session:
+        session.cookies.set('session_id', session_id)
+        while time.monotonic() < deadline:
+            resp = session.get(f"{URL}/profile")
+            assert resp.status_code == 200
+            count += 1
+
+    return count
+
+
+if __name__ == '__main__':
+    thread_counts = [int(arg) for arg in sys.argv[1:]] or [1, 2, 4, 8]
+    session_id = log_in()
+    for threads in thread_counts:
+        deadline = time.monotonic() + DURATION
+        with ThreadPoolExecutor(threads) as executor:
+            counts = executor.map(hammer, [session_id] * threads,
+                                  [deadline] * threads)
+            total = sum(counts)
+        print("{:>3} threads: {:.0f} req/s".format(threads, total / DURATION))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Tests of the Auth class, on a throwaway sqlite database
+Usage: python3 -m unittest test_auth.py
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import typing as t
+import unittest
+
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+
+from sqlalchemy import event  # noqa: E402
+
+from async_auth import AsyncAuth  # noqa: E402
+from auth import Auth, SessionCache  # noqa: E402
+
+
+def make_auth(test: unittest.TestCase, cls: type) -> t.Any:
+    """
+    Build cls on a database removed when test ends
+    """
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    test.addCleanup(os.remove, path)
+    url = os.environ.get('AUTH_DB_URL')
+    os.environ['AUTH_DB_URL'] = f"sqlite:///{path}"
+    try:
+        auth = cls()
+    finally:
+        if url is None:
+            del os.environ['AUTH_DB_URL']
+        else:
+            os.environ['AUTH_DB_URL'] = url
+
+    return auth
+
+
+class TestAuth(unittest.TestCase):
+    """
+    Auth against a fresh database
+    """
+    def setUp(self) -> None:
+        """
+        Create an Auth on an empty database with one user
+        """
+        self.auth = make_auth(self, Auth)
+        self.addCleanup(self.auth._db._engine.dispose)
+        self.auth.register_user('bob@example.com', 'pwd')
+        self.auth.close()
+
+    def count_statements(self) -> list:
+        """
+        Record the verb of every statement sent to the database
+        """
+        statements = []
+
+        def record(conn, cursor, statement, *args) -> None:
+            """
+            Keep the first word of the statement
+            """
+            statements.append(statement.split(None, 1)[0].upper())
+
+        engine = self.auth._db._engine
+        event.listen(engine, 'before_cursor_execute', record)
+        self.addCleanup(
+            event.remove, engine, 'before_cursor_execute', record
+        )
+
+        return statements
+
+    def test_login_is_one_select_and_one_update(self) -> None:
+        """
+        A good login reads the user once and writes its session once
+        """
+        statements = self.count_statements()
+        session_id = self.auth.login('bob@example.com', 'pwd')
+
+        self.assertIsNotNone(session_id)
+        self.assertEqual(statements, ['SELECT', 'UPDATE'])
+
+    def test_bad_password_is_one_select(self) -> None:
+        """
+        A wrong password only reads the user
+        """
+        statements = self.count_statements()
+
+        self.assertIsNone(self.auth.login('bob@example.com', 'nope'))
+        self.assertEqual(statements, ['SELECT'])
+
+    def test_unknown_email_is_one_select(self) -> None:
+        """
+        An unknown email only looks the user up
+        """
+        statements = self.count_statements()
+
+        self.assertIsNone(self.auth.login('eve@example.com', 'pwd'))
+        self.assertEqual(statements, ['SELECT'])
+
+    def test_logout_is_not_served_from_cache(self) -> None:
+        """
+        A destroyed session isn't found anymore
+        """
+        session_id = self.auth.login('bob@example.com', 'pwd')
+        user = self.auth.get_user_from_session_id(session_id)
+        self.auth.destroy_session(user.id)
+
+        self.assertIsNone(self.auth.get_user_from_session_id(session_id))
+
+
+class TestAsyncAuth(unittest.TestCase):
+    """
+    AsyncAuth runs the Auth methods off the event loop
+    """
+    def test_session_lifecycle(self) -> None:
+        """
+        Register, log in, look the session up and log out
+        """
+        auth = make_auth(self, AsyncAuth)
+        self.addCleanup(auth._auth._db._engine.dispose)
+        self.addCleanup(auth._db._executor.shutdown)
+
+        async def lifecycle() -> t.Tuple[t.Any, ...]:
+            await auth.register_user('bob@example.com', 'pwd')
+            bad = await auth.login('bob@example.com', 'nope')
+            session_id = await auth.login('bob@example.com', 'pwd')
+            user = await auth.get_user_from_session_id(session_id)
+            await auth.destroy_session(user.id)
+            gone = await auth.get_user_from_session_id(session_id)
+
+            return bad, session_id, user.email, gone
+
+        bad, session_id, email, gone = asyncio.run(lifecycle())
+
+        self.assertIsNone(bad)
+        self.assertIsNotNone(session_id)
+        self.assertEqual(email, 'bob@example.com')
+        self.assertIsNone(gone)
+
+    def test_cache_hit_skips_the_database_pool(self) -> None:
+        """
+        A cached session is answered while every database thread is
+        busy
+        """
+        auth = make_auth(self, AsyncAuth)
+        self.addCleanup(auth._auth._db._engine.dispose)
+        self.addCleanup(auth._db._executor.shutdown)
+        busy = threading.Event()
+        self.addCleanup(busy.set)
+
+        async def hit_while_busy() -> t.Any:
+            await auth.register_user('bob@example.com', 'pwd')
+            session_id = await auth.login('bob@example.com', 'pwd')
+            for _ in range(auth._db._executor._max_workers):
+                auth._db._executor.submit(busy.wait)
+
+            return await asyncio.wait_for(
+                auth.get_user_from_session_id(session_id),
+                1
+            )
+
+        user = asyncio.run(hit_while_busy())
+
+        self.assertEqual(user.email, 'bob@example.com')
+
+
+class TestSessionCache(unittest.TestCase):
+    """
+    SessionCache consistency with concurrent lookups
+    """
+    def test_stale_miss_is_not_cached(self) -> None:
+        """
+        A lookup that read the old session before a login doesn't
+        replace the session of that login
+        """
+        cache = SessionCache()
+        token = cache.token()
+        cache.set('new', 1, 'bob@example.com')
+        cache.set('old', 1, 'bob@example.com', token)
+
+        self.assertIsNone(cache.get('old'))
+        self.assertEqual(cache.get('new'), (1, 'bob@example.com'))
+
+    def test_miss_after_invalidation_is_not_cached(self) -> None:
+        """
+        A lookup that read a session before its logout doesn't cache it
+        """
+        cache = SessionCache()
+        token = cache.token()
+        cache.invalidate_user(1)
+        cache.set('old', 1, 'bob@example.com', token)
+
+        self.assertIsNone(cache.get('old'))
+
+    def test_fresh_miss_is_cached(self) -> None:
+        """
+        A lookup with no change of the user since its token is cached
+        """
+        cache = SessionCache()
+        cache.invalidate_user(2)
+        token = cache.token()
+        cache.set('sid', 1, 'bob@example.com', token)
+
+        self.assertEqual(cache.get('sid'), (1, 'bob@example.com'))
+
+    def test_forgotten_changes_refuse_older_tokens(self) -> None:
+        """
+        Tokens older than the changes no longer tracked are refused
+        """
+        cache = SessionCache(maxsize=1)
+        token = cache.token()
+        cache.invalidate_user(1)
+        cache.invalidate_user(2)
+        cache.set('sid', 1, 'bob@example.com', token)
+
+        self.assertIsNone(cache.get('sid'))
+
+
+if __name__ == '__main__':
+    unittest.main()
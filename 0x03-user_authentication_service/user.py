@@ -18,7 +18,8 @@ class User(Base):
     """
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True, nullable=False)
-    email = Column(String(250), nullable=False)
+    email = Column(String(250), nullable=False, unique=True, index=True)
     hashed_password = Column(String(250), nullable=False)
-    session_id = Column(String(250))
-    reset_token = Column(String(250))
+    session_id = Column(String(250), index=True)
+    reset_token = Column(String(250), index=True)
+    version = Column(Integer, nullable=False, default=0, server_default='0')